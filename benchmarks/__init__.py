@@ -0,0 +1,7 @@
+"""
+Offline benchmarks of the collector's hot paths.
+
+Run them from the repository root, e.g.
+
+    python -m benchmarks.hud_render
+"""
@@ -0,0 +1,118 @@
+"""
+Benchmark of the recorder's image encoders on synthetic frames.
+
+    python -m benchmarks.encoders --res 640x480 1280x720 --frames 50
+
+Reports ms/frame, MB/s of raw BGRA input and bytes/frame for every backend
+that can be loaded here, optionally as JSON with --json FILE.
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from encoders import ENCODERS, available_encoders, make_encoder
+
+
+def synthetic_scene(width, height, seed=0):
+    """A BGRA frame that compresses roughly like a street scene: sky, facades, road, sensor noise."""
+    rng = np.random.default_rng(seed)
+    frame = np.empty((height, width, 4), dtype=np.uint8)
+    horizon = height // 2
+    sky = np.linspace(230, 150, horizon)[:, None]
+    frame[:horizon, :, 0] = sky
+    frame[:horizon, :, 1] = sky * 0.85
+    frame[:horizon, :, 2] = sky * 0.7
+    frame[horizon:, :, :3] = 90
+    for _ in range(12):
+        x0 = rng.integers(0, width)
+        w = rng.integers(width // 20, width // 5)
+        top = rng.integers(horizon // 4, horizon)
+        frame[top:horizon + height // 10, x0:x0 + w, :3] = rng.integers(40, 200, 3)
+        for y in range(top + 5, horizon, 12):
+            frame[y:y + 6, x0 + 3:x0 + w - 3:9, :3] = 30
+    noise = rng.integers(-6, 7, (height, width, 3))
+    frame[:, :, :3] = np.clip(frame[:, :, :3] + noise, 0, 255)
+    frame[:, :, 3] = 255
+    return frame
+
+
+def time_encoder(encoder, frames):
+    sizes = []
+    start = time.perf_counter()
+    for frame in frames:
+        sizes.append(len(encoder.encode(frame)))
+    return time.perf_counter() - start, sizes
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description='Benchmark the image encoders of the recorder')
+    argparser.add_argument(
+        '--res',
+        metavar='WIDTHxHEIGHT',
+        nargs='+',
+        default=['640x480', '1280x720', '1920x1080'],
+        help='frame sizes (default: 640x480 1280x720 1920x1080)')
+    argparser.add_argument(
+        '--frames',
+        default=50,
+        type=int,
+        help='frames encoded per backend and size (default: 50)')
+    argparser.add_argument(
+        '--encoders',
+        nargs='+',
+        choices=sorted(ENCODERS),
+        default=None,
+        help='backends to run (default: every one available)')
+    argparser.add_argument(
+        '--quality',
+        default=None,
+        type=int,
+        help='quality of the jpeg, webp, turbojpeg and pil encoders')
+    argparser.add_argument(
+        '--png-level',
+        default=None,
+        type=int,
+        help='compression level of the png encoder')
+    argparser.add_argument(
+        '--json',
+        metavar='FILE',
+        default=None,
+        help='also write the results to FILE')
+    args = argparser.parse_args()
+
+    names = args.encoders or available_encoders()
+    results = []
+    print('%-10s %10s %10s %10s %12s %7s' % ('encoder', 'size', 'ms/frame', 'MB/s', 'bytes/frame', 'ratio'))
+    for res in args.res:
+        width, height = [int(x) for x in res.split('x')]
+        # A few different frames, so no backend gets a cache-warm single image.
+        frames = [synthetic_scene(width, height, seed) for seed in range(4)]
+        frames = [frames[n % len(frames)] for n in range(args.frames)]
+        for name in names:
+            encoder = make_encoder(name, args.quality, args.png_level)
+            encoder.encode(frames[0])
+            seconds, sizes = time_encoder(encoder, frames)
+            result = {
+                'encoder': name,
+                'width': width,
+                'height': height,
+                'frames': len(frames),
+                'ms_per_frame': 1e3 * seconds / len(frames),
+                'mb_per_s': frames[0].nbytes * len(frames) / seconds / 1e6,
+                'bytes_per_frame': float(np.mean(sizes)),
+                'ratio': frames[0].nbytes / float(np.mean(sizes))}
+            results.append(result)
+            print('%-10s %10s %10.2f %10.1f %12.0f %7.1f' % (
+                name, res, result['ms_per_frame'], result['mb_per_s'], result['bytes_per_frame'], result['ratio']))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,848 @@
+"""
+Stand-in for the carla module so the collector runs without a CARLA server.
+
+It fakes just enough of the client API for the collector: a Client with
+worlds per town, a fixed-step World whose tick() moves autopilot vehicles
+and delivers sensor data to the listening sensors, camera Images with raw
+BGRA buffers of the requested resolution, and a Map whose roads form a
+grid of straight two-lane roads between junctions, with waypoints and
+topology.
+
+install() registers it as ``carla`` in sys.modules, it has to be called
+before any of the collector modules are imported.
+"""
+
+import collections
+import itertools
+import math
+import sys
+import threading
+import types
+
+import numpy as np
+
+
+# ==============================================================================
+# -- Geometry ------------------------------------------------------------------
+# ==============================================================================
+
+
+class Vector3D(object):
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+
+class Location(Vector3D):
+    def distance(self, other):
+        return ((self.x - other.x)**2 + (self.y - other.y)**2 + (self.z - other.z)**2) ** 0.5
+
+
+class Rotation(object):
+    def __init__(self, pitch=0.0, yaw=0.0, roll=0.0):
+        self.pitch = pitch
+        self.yaw = yaw
+        self.roll = roll
+
+
+class Transform(object):
+    def __init__(self, location=None, rotation=None):
+        self.location = location if location is not None else Location()
+        self.rotation = rotation if rotation is not None else Rotation()
+
+    def copy(self):
+        return Transform(
+            Location(self.location.x, self.location.y, self.location.z),
+            Rotation(self.rotation.pitch, self.rotation.yaw, self.rotation.roll))
+
+    def get_matrix(self):
+        # Same convention as carla::geom::Transform::GetMatrix.
+        cy, sy = math.cos(math.radians(self.rotation.yaw)), math.sin(math.radians(self.rotation.yaw))
+        cr, sr = math.cos(math.radians(self.rotation.roll)), math.sin(math.radians(self.rotation.roll))
+        cp, sp = math.cos(math.radians(self.rotation.pitch)), math.sin(math.radians(self.rotation.pitch))
+        return [
+            [cp * cy, cy * sp * sr - sy * cr, -cy * sp * cr - sy * sr, self.location.x],
+            [cp * sy, sy * sp * sr + cy * cr, -sy * sp * cr + cy * sr, self.location.y],
+            [sp, -cp * sr, cp * cr, self.location.z],
+            [0.0, 0.0, 0.0, 1.0]]
+
+
+class BoundingBox(object):
+    def __init__(self, extent):
+        self.extent = extent
+
+
+# ==============================================================================
+# -- Enums and controls --------------------------------------------------------
+# ==============================================================================
+
+
+class ColorConverter(object):
+    Raw = 0
+
+
+class AttachmentType(object):
+    Rigid = 0
+    SpringArm = 1
+    SpringArmGhost = 2
+
+
+class VehicleLightState(int):
+    NONE = 0
+    Position = 1
+    LowBeam = 2
+    HighBeam = 4
+    Brake = 8
+    RightBlinker = 16
+    LeftBlinker = 32
+    Reverse = 64
+    Fog = 128
+    Interior = 256
+    Special1 = 512
+    Special2 = 1024
+    All = 0xFFFF
+
+
+class VehicleControl(object):
+    def __init__(self, throttle=0.0, steer=0.0, brake=0.0, hand_brake=False, reverse=False,
+                 manual_gear_shift=False, gear=0):
+        self.throttle = throttle
+        self.steer = steer
+        self.brake = brake
+        self.hand_brake = hand_brake
+        self.reverse = reverse
+        self.manual_gear_shift = manual_gear_shift
+        self.gear = gear
+
+
+# ==============================================================================
+# -- Weather -------------------------------------------------------------------
+# ==============================================================================
+
+
+class WeatherParameters(object):
+    def __init__(self, cloudiness=0.0, precipitation=0.0, precipitation_deposits=0.0,
+                 wind_intensity=0.0, sun_azimuth_angle=0.0, sun_altitude_angle=0.0,
+                 fog_density=0.0, wetness=0.0):
+        self.cloudiness = cloudiness
+        self.precipitation = precipitation
+        self.precipitation_deposits = precipitation_deposits
+        self.wind_intensity = wind_intensity
+        self.sun_azimuth_angle = sun_azimuth_angle
+        self.sun_altitude_angle = sun_altitude_angle
+        self.fog_density = fog_density
+        self.wetness = wetness
+
+
+WeatherParameters.ClearNoon = WeatherParameters(sun_altitude_angle=45.0)
+WeatherParameters.CloudyNoon = WeatherParameters(cloudiness=60.0, sun_altitude_angle=45.0)
+WeatherParameters.WetSunset = WeatherParameters(wetness=50.0, sun_altitude_angle=15.0)
+WeatherParameters.HardRainNoon = WeatherParameters(
+    cloudiness=100.0, precipitation=100.0, precipitation_deposits=90.0, wetness=100.0,
+    wind_intensity=100.0, sun_altitude_angle=45.0)
+WeatherParameters.ClearNight = WeatherParameters(sun_altitude_angle=-90.0)
+
+
+# ==============================================================================
+# -- Sensor data ---------------------------------------------------------------
+# ==============================================================================
+
+
+_buffers = {}
+
+
+def synthetic_buffer(width, height):
+    """A noisy BGRA frame, shared by every image of that size."""
+    key = (width, height)
+    if key not in _buffers:
+        rng = np.random.default_rng(width * 10007 + height)
+        gradient = np.linspace(0, 255, width, dtype=np.uint8)[None, :, None]
+        noise = rng.integers(0, 64, (height, width, 4), dtype=np.uint8)
+        frame = (gradient + noise).astype(np.uint8)
+        frame[:, :, 3] = 255
+        _buffers[key] = frame.tobytes()
+    return _buffers[key]
+
+
+class SensorData(object):
+    def __init__(self, frame, timestamp, transform):
+        self.frame = frame
+        self.timestamp = timestamp
+        self.transform = transform
+
+
+class Image(SensorData):
+    def __init__(self, frame, timestamp=0.0, width=640, height=480, fov=90.0, raw_data=None,
+                 transform=None):
+        super(Image, self).__init__(frame, timestamp, transform or Transform())
+        self.width = width
+        self.height = height
+        self.fov = fov
+        self.raw_data = raw_data if raw_data is not None else synthetic_buffer(width, height)
+
+
+class GnssMeasurement(SensorData):
+    def __init__(self, frame, timestamp, transform, latitude, longitude, altitude=0.0):
+        super(GnssMeasurement, self).__init__(frame, timestamp, transform)
+        self.latitude = latitude
+        self.longitude = longitude
+        self.altitude = altitude
+
+
+# ==============================================================================
+# -- Blueprints ----------------------------------------------------------------
+# ==============================================================================
+
+
+class ActorAttribute(object):
+    def __init__(self, value, recommended_values=()):
+        self.value = value
+        self.recommended_values = list(recommended_values)
+
+    def as_int(self):
+        return int(self.value)
+
+    def as_float(self):
+        return float(self.value)
+
+    def __str__(self):
+        return str(self.value)
+
+
+class ActorBlueprint(object):
+    def __init__(self, id, attributes=None):
+        self.id = id
+        self._attributes = dict(attributes or {})
+
+    def has_attribute(self, name):
+        return name in self._attributes
+
+    def get_attribute(self, name):
+        return self._attributes[name]
+
+    def set_attribute(self, name, value):
+        if name in self._attributes:
+            self._attributes[name].value = value
+        else:
+            self._attributes[name] = ActorAttribute(value)
+
+
+class BlueprintLibrary(object):
+    def __init__(self):
+        vehicle = {
+            'role_name': ActorAttribute('autopilot'),
+            'color': ActorAttribute('0,0,0', ['0,0,0', '255,255,255']),
+            'speed': ActorAttribute('1.0', ['0.0', '1.589', '3.713'])}
+        camera = {
+            'image_size_x': ActorAttribute('800'),
+            'image_size_y': ActorAttribute('600'),
+            'fov': ActorAttribute('90'),
+            'gamma': ActorAttribute('2.2'),
+            'sensor_tick': ActorAttribute('0.0')}
+        self._ids = {
+            'vehicle.lincoln.mkz_2020': vehicle,
+            'vehicle.audi.tt': vehicle,
+            'vehicle.tesla.model3': vehicle,
+            'sensor.camera.rgb': camera,
+            'sensor.camera.depth': camera,
+            'sensor.camera.semantic_segmentation': camera,
+            'sensor.other.gnss': {'sensor_tick': ActorAttribute('0.0')}}
+
+    def find(self, id):
+        return ActorBlueprint(id, {
+            name: ActorAttribute(attr.value, attr.recommended_values)
+            for name, attr in self._ids[id].items()})
+
+    def filter(self, pattern):
+        prefix = pattern.rstrip('*')
+        return [self.find(id) for id in self._ids if id.startswith(prefix)]
+
+
+# ==============================================================================
+# -- Actors --------------------------------------------------------------------
+# ==============================================================================
+
+
+_actor_ids = itertools.count(1)
+
+
+class Actor(object):
+    def __init__(self, world, type_id, transform, parent=None, attributes=None):
+        self.id = next(_actor_ids)
+        self.type_id = type_id
+        self.parent = parent
+        self.attributes = attributes or {}
+        self.is_alive = True
+        self._world = world
+        self._transform = transform.copy()
+        self._velocity = Vector3D()
+
+    def get_world(self):
+        return self._world
+
+    def get_transform(self):
+        if self.parent is None:
+            return self._transform.copy()
+        # Good enough for a rig: offsets are rotated by the parent's yaw.
+        base = self.parent.get_transform()
+        yaw = math.radians(base.rotation.yaw)
+        x, y = self._transform.location.x, self._transform.location.y
+        return Transform(
+            Location(
+                base.location.x + x * math.cos(yaw) - y * math.sin(yaw),
+                base.location.y + x * math.sin(yaw) + y * math.cos(yaw),
+                base.location.z + self._transform.location.z),
+            Rotation(
+                base.rotation.pitch + self._transform.rotation.pitch,
+                base.rotation.yaw + self._transform.rotation.yaw,
+                base.rotation.roll + self._transform.rotation.roll))
+
+    def get_location(self):
+        return self.get_transform().location
+
+    def set_transform(self, transform):
+        self._transform = transform.copy()
+
+    def get_velocity(self):
+        return self._velocity
+
+    def destroy(self):
+        if not self.is_alive:
+            return False
+        self.is_alive = False
+        self._world._remove(self)
+        return True
+
+
+class Vehicle(Actor):
+    def __init__(self, world, type_id, transform, attributes=None):
+        super(Vehicle, self).__init__(world, type_id, transform, attributes=attributes)
+        self.bounding_box = BoundingBox(Vector3D(2.4, 1.0, 0.8))
+        self.autopilot = False
+        self.speed = 8.0
+        self._control = VehicleControl()
+        self._lights = VehicleLightState.NONE
+        self._physics = True
+        # Locations set by TrafficManager.set_path, driven before wandering again.
+        self._path = []
+        self._path_index = 0
+
+    def set_autopilot(self, enabled=True, tm_port=8000):
+        self.autopilot = enabled
+
+    def get_control(self):
+        return self._control
+
+    def apply_control(self, control):
+        self._control = control
+
+    def set_light_state(self, state):
+        self._lights = state
+
+    def get_light_state(self):
+        return self._lights
+
+    def get_physics_control(self):
+        raise RuntimeError('no physics in the fake server')
+
+    def set_target_velocity(self, velocity):
+        self._velocity = velocity
+
+    def set_simulate_physics(self, enabled=True):
+        self._physics = enabled
+
+    def enable_constant_velocity(self, velocity):
+        self._velocity = velocity
+
+    def disable_constant_velocity(self):
+        self._velocity = Vector3D()
+
+    def _step(self, dt):
+        if not self.autopilot:
+            if self._physics:
+                self._drive(dt)
+            return
+        if self._path_index < len(self._path):
+            self._follow_path(dt)
+            return
+        # Drive a wide circle so poses keep changing.
+        yaw = math.radians(self._transform.rotation.yaw)
+        self._transform.location.x += self.speed * dt * math.cos(yaw)
+        self._transform.location.y += self.speed * dt * math.sin(yaw)
+        self._transform.rotation.yaw = (self._transform.rotation.yaw + 2.0 * dt + 180.0) % 360.0 - 180.0
+        self._velocity = Vector3D(self.speed * math.cos(yaw), self.speed * math.sin(yaw), 0.0)
+
+    def _follow_path(self, dt):
+        # Straight from one location to the next, the lanes are straight.
+        location = self._transform.location
+        step = self.speed * dt
+        while step > 0.0 and self._path_index < len(self._path):
+            target = self._path[self._path_index]
+            dx, dy = target.x - location.x, target.y - location.y
+            distance = math.hypot(dx, dy)
+            if distance > 1e-6:
+                self._transform.rotation.yaw = math.degrees(math.atan2(dy, dx))
+            if distance <= step:
+                location.x, location.y = target.x, target.y
+                self._path_index += 1
+                step -= distance
+            else:
+                location.x += dx / distance * step
+                location.y += dy / distance * step
+                step = 0.0
+        yaw = math.radians(self._transform.rotation.yaw)
+        self._velocity = Vector3D(self.speed * math.cos(yaw), self.speed * math.sin(yaw), 0.0)
+
+    def _drive(self, dt):
+        # Kinematic bicycle: enough for a controller to steer the car around.
+        control = self._control
+        speed = math.hypot(self._velocity.x, self._velocity.y)
+        speed = max(speed + (6.0 * control.throttle - 10.0 * control.brake) * dt, 0.0)
+        if speed == 0.0:
+            self._velocity = Vector3D()
+            return
+        yaw = math.radians(self._transform.rotation.yaw)
+        yaw += speed / 2.9 * math.tan(math.radians(70.0) * control.steer) * dt
+        self._transform.location.x += speed * dt * math.cos(yaw)
+        self._transform.location.y += speed * dt * math.sin(yaw)
+        self._transform.rotation.yaw = (math.degrees(yaw) + 180.0) % 360.0 - 180.0
+        self._velocity = Vector3D(speed * math.cos(yaw), speed * math.sin(yaw), 0.0)
+
+
+class Sensor(Actor):
+    def __init__(self, world, type_id, transform, parent=None, attributes=None):
+        super(Sensor, self).__init__(world, type_id, transform, parent, attributes)
+        self._callback = None
+        self._next_time = 0.0
+
+    @property
+    def is_listening(self):
+        return self._callback is not None
+
+    def listen(self, callback):
+        self._callback = callback
+
+    def stop(self):
+        self._callback = None
+
+    def _measure(self, frame, timestamp):
+        callback = self._callback
+        if callback is None:
+            return
+        sensor_tick = float(self.attributes.get('sensor_tick', 0.0))
+        if timestamp + 1e-9 < self._next_time:
+            return
+        self._next_time = timestamp + sensor_tick
+        transform = self.get_transform()
+        if self.type_id.startswith('sensor.camera'):
+            data = Image(
+                frame, timestamp,
+                int(self.attributes.get('image_size_x', 800)),
+                int(self.attributes.get('image_size_y', 600)),
+                float(self.attributes.get('fov', 90.0)),
+                transform=transform)
+        else:
+            data = GnssMeasurement(
+                frame, timestamp, transform,
+                transform.location.y * 1e-5, transform.location.x * 1e-5)
+        callback(data)
+
+
+class ActorList(list):
+    def filter(self, pattern):
+        prefix = pattern.rstrip('*')
+        return ActorList(actor for actor in self if actor.type_id.startswith(prefix))
+
+    def find(self, actor_id):
+        for actor in self:
+            if actor.id == actor_id:
+                return actor
+        return None
+
+
+# ==============================================================================
+# -- World ---------------------------------------------------------------------
+# ==============================================================================
+
+
+class WorldSettings(object):
+    def __init__(self, synchronous_mode=False, fixed_delta_seconds=None, no_rendering_mode=False):
+        self.synchronous_mode = synchronous_mode
+        self.fixed_delta_seconds = fixed_delta_seconds
+        self.no_rendering_mode = no_rendering_mode
+
+
+class Timestamp(object):
+    def __init__(self, frame, elapsed_seconds, delta_seconds):
+        self.frame = frame
+        self.elapsed_seconds = elapsed_seconds
+        self.delta_seconds = delta_seconds
+        self.platform_timestamp = elapsed_seconds
+
+
+class ActorSnapshot(object):
+    def __init__(self, actor):
+        self.id = actor.id
+        self._transform = actor.get_transform()
+        self._velocity = actor.get_velocity()
+
+    def get_transform(self):
+        return self._transform
+
+    def get_velocity(self):
+        return self._velocity
+
+
+class WorldSnapshot(object):
+    def __init__(self, world):
+        self.frame = world.frame
+        self.timestamp = Timestamp(world.frame, world.elapsed_seconds, world.delta_seconds)
+        self.elapsed_seconds = world.elapsed_seconds
+        self.delta_seconds = world.delta_seconds
+        self._actors = {actor.id: ActorSnapshot(actor) for actor in world._actors}
+
+    def find(self, actor_id):
+        return self._actors.get(actor_id)
+
+    def __iter__(self):
+        return iter(self._actors.values())
+
+    def __len__(self):
+        return len(self._actors)
+
+
+class Lane(object):
+    """A straight lane from start to end, s runs along its road."""
+
+    def __init__(self, road_id, lane_id, start, end, is_junction=False):
+        self.road_id = road_id
+        self.lane_id = lane_id
+        self.start = start
+        self.end = end
+        self.is_junction = is_junction
+        self.length = math.hypot(end[0] - start[0], end[1] - start[1])
+        self.yaw = math.degrees(math.atan2(end[1] - start[1], end[0] - start[0]))
+        self.successors = []
+
+
+class Waypoint(object):
+    def __init__(self, lane, distance):
+        self.lane = lane
+        self.distance = distance
+        self.road_id = lane.road_id
+        self.section_id = 0
+        self.lane_id = lane.lane_id
+        self.is_junction = lane.is_junction
+        # Lanes against the road direction (positive ids) count s backwards.
+        self.s = lane.length - distance if lane.lane_id > 0 else distance
+        self.id = hash((lane.road_id, lane.lane_id, round(distance, 3)))
+        t = distance / lane.length if lane.length else 0.0
+        self.transform = Transform(
+            Location(
+                lane.start[0] + t * (lane.end[0] - lane.start[0]),
+                lane.start[1] + t * (lane.end[1] - lane.start[1]), 0.0),
+            Rotation(yaw=lane.yaw))
+
+    def next(self, distance):
+        if self.distance + distance <= self.lane.length:
+            return [Waypoint(self.lane, self.distance + distance)]
+        remaining = self.distance + distance - self.lane.length
+        return [Waypoint(lane, min(remaining, lane.length)) for lane in self.lane.successors]
+
+
+class Map(object):
+    """Junctions on the 50 x 40 m grid of the spawn points, joined by two-lane roads."""
+
+    def __init__(self, name, spawn_points=20, columns=5, rows=4, junction_radius=6.0, lane_width=3.5):
+        self.name = 'Carla/Maps/%s' % name
+        self._spawn_points = [
+            Transform(Location(50.0 * (n % 5), 40.0 * (n // 5), 0.5), Rotation(yaw=90.0 * (n % 4)))
+            for n in range(spawn_points)]
+        self._lanes = []
+        incoming = collections.defaultdict(list)
+        outgoing = collections.defaultdict(list)
+        junctions = [(i, j) for j in range(rows) for i in range(columns)]
+        roads = [((i, j), (i + 1, j)) for i, j in junctions if i + 1 < columns] + \
+            [((i, j), (i, j + 1)) for i, j in junctions if j + 1 < rows]
+        for road_id, (a, b) in enumerate(roads):
+            ax, ay, bx, by = 50.0 * a[0], 40.0 * a[1], 50.0 * b[0], 40.0 * b[1]
+            length = math.hypot(bx - ax, by - ay)
+            dx, dy = (bx - ax) / length, (by - ay) / length
+            # Driving on the right: lane -1 from a to b, lane 1 back.
+            ox, oy = dy * lane_width / 2.0, -dx * lane_width / 2.0
+            r = junction_radius
+            forward = Lane(road_id, -1, (ax + r * dx + ox, ay + r * dy + oy), (bx - r * dx + ox, by - r * dy + oy))
+            backward = Lane(road_id, 1, (bx - r * dx - ox, by - r * dy - oy), (ax + r * dx - ox, ay + r * dy - oy))
+            self._lanes += [forward, backward]
+            outgoing[a].append(forward)
+            incoming[b].append(forward)
+            outgoing[b].append(backward)
+            incoming[a].append(backward)
+        road_id = len(roads)
+        for junction in junctions:
+            for lane_in in incoming[junction]:
+                for lane_out in outgoing[junction]:
+                    if lane_out.road_id == lane_in.road_id:
+                        continue
+                    connector = Lane(road_id, -1, lane_in.end, lane_out.start, is_junction=True)
+                    connector.successors.append(lane_out)
+                    lane_in.successors.append(connector)
+                    self._lanes.append(connector)
+                    road_id += 1
+
+    def get_spawn_points(self):
+        return [transform.copy() for transform in self._spawn_points]
+
+    def get_topology(self):
+        return [(Waypoint(lane, 0.0), Waypoint(lane, lane.length)) for lane in self._lanes]
+
+    def get_waypoint(self, location, project_to_road=True):
+        """Waypoint of the nearest lane, a road lane when one is as close as a connector."""
+        best = None
+        for lane in self._lanes:
+            dx, dy = lane.end[0] - lane.start[0], lane.end[1] - lane.start[1]
+            t = ((location.x - lane.start[0]) * dx + (location.y - lane.start[1]) * dy) / (lane.length ** 2 or 1.0)
+            t = min(max(t, 0.0), 1.0)
+            distance = math.hypot(lane.start[0] + t * dx - location.x, lane.start[1] + t * dy - location.y)
+            key = (round(distance, 1), lane.is_junction)
+            if best is None or key < best[0]:
+                best = (key, lane, t * lane.length)
+        return Waypoint(best[1], best[2])
+
+
+class World(object):
+    def __init__(self, town='Town10HD_Opt'):
+        self.id = next(_actor_ids)
+        self.town = town
+        self.frame = 0
+        self.elapsed_seconds = 0.0
+        self.delta_seconds = 0.05
+        self._settings = WorldSettings()
+        self._weather = WeatherParameters.ClearNoon
+        self._map = Map(town)
+        self._blueprints = BlueprintLibrary()
+        self._actors = []
+        self._on_tick = {}
+        self._callback_ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def get_map(self):
+        return self._map
+
+    def get_settings(self):
+        return WorldSettings(
+            self._settings.synchronous_mode, self._settings.fixed_delta_seconds,
+            self._settings.no_rendering_mode)
+
+    def apply_settings(self, settings):
+        self._settings = WorldSettings(
+            settings.synchronous_mode, settings.fixed_delta_seconds, settings.no_rendering_mode)
+        return self.frame
+
+    def get_weather(self):
+        weather = WeatherParameters()
+        weather.__dict__.update(self._weather.__dict__)
+        return weather
+
+    def set_weather(self, weather):
+        self._weather = weather
+
+    def get_blueprint_library(self):
+        return self._blueprints
+
+    def get_actors(self, actor_ids=None):
+        with self._lock:
+            actors = ActorList(self._actors)
+        if actor_ids is not None:
+            actors = ActorList(actor for actor in actors if actor.id in set(actor_ids))
+        return actors
+
+    def get_actor(self, actor_id):
+        return self.get_actors().find(actor_id)
+
+    def get_snapshot(self):
+        with self._lock:
+            return WorldSnapshot(self)
+
+    def get_spectator(self):
+        return Actor(self, 'spectator', Transform())
+
+    def spawn_actor(self, blueprint, transform, attach_to=None, attachment_type=None):
+        attributes = {name: attr.value for name, attr in blueprint._attributes.items()}
+        if blueprint.id.startswith('vehicle'):
+            actor = Vehicle(self, blueprint.id, transform, attributes)
+        else:
+            actor = Sensor(self, blueprint.id, transform, attach_to, attributes)
+        with self._lock:
+            self._actors.append(actor)
+        return actor
+
+    def try_spawn_actor(self, blueprint, transform, attach_to=None, attachment_type=None):
+        return self.spawn_actor(blueprint, transform, attach_to, attachment_type)
+
+    def on_tick(self, callback):
+        callback_id = next(self._callback_ids)
+        self._on_tick[callback_id] = callback
+        return callback_id
+
+    def remove_on_tick(self, callback_id):
+        self._on_tick.pop(callback_id, None)
+
+    def tick(self, seconds=10.0):
+        """Advance one fixed step, sensors deliver before tick() returns."""
+        with self._lock:
+            self.delta_seconds = self._settings.fixed_delta_seconds or 0.05
+            self.frame += 1
+            self.elapsed_seconds += self.delta_seconds
+            actors = list(self._actors)
+        for actor in actors:
+            if isinstance(actor, Vehicle):
+                actor._step(self.delta_seconds)
+        snapshot = self.get_snapshot()
+        for callback in list(self._on_tick.values()):
+            callback(snapshot)
+        for actor in actors:
+            if isinstance(actor, Sensor) and actor.is_alive:
+                actor._measure(self.frame, self.elapsed_seconds)
+        return self.frame
+
+    def wait_for_tick(self, seconds=10.0):
+        if not self._settings.synchronous_mode:
+            self.tick()
+        return self.get_snapshot()
+
+    def _remove(self, actor):
+        with self._lock:
+            if actor in self._actors:
+                self._actors.remove(actor)
+
+
+# ==============================================================================
+# -- Commands ------------------------------------------------------------------
+# ==============================================================================
+
+
+class SpawnActor(object):
+    def __init__(self, blueprint, transform, parent_id=0):
+        self.blueprint = blueprint
+        self.transform = transform
+        self.parent_id = parent_id
+
+
+class DestroyActor(object):
+    def __init__(self, actor_id):
+        self.actor_id = actor_id
+
+
+class Response(object):
+    def __init__(self, actor_id=0, error=''):
+        self.actor_id = actor_id
+        self.error = error
+
+    def has_error(self):
+        return bool(self.error)
+
+
+command = types.ModuleType('carla.command')
+command.SpawnActor = SpawnActor
+command.DestroyActor = DestroyActor
+command.Response = Response
+
+
+def _apply_command(world, cmd):
+    if isinstance(cmd, SpawnActor):
+        parent = world.get_actor(cmd.parent_id) if cmd.parent_id else None
+        if cmd.parent_id and parent is None:
+            return Response(error='parent %d not found' % cmd.parent_id)
+        return Response(world.spawn_actor(cmd.blueprint, cmd.transform, attach_to=parent).id)
+    if isinstance(cmd, DestroyActor):
+        actor = world.get_actor(cmd.actor_id)
+        if actor is None:
+            return Response(cmd.actor_id, 'actor %d not found' % cmd.actor_id)
+        actor.destroy()
+        return Response(cmd.actor_id)
+    return Response(error='unsupported command %s' % type(cmd).__name__)
+
+
+# ==============================================================================
+# -- Client --------------------------------------------------------------------
+# ==============================================================================
+
+
+class TrafficManager(object):
+    def __init__(self, port):
+        self.port = port
+        self.synchronous_mode = False
+        self.seed = None
+
+    def get_port(self):
+        return self.port
+
+    def set_synchronous_mode(self, mode=True):
+        self.synchronous_mode = mode
+
+    def set_random_device_seed(self, seed):
+        self.seed = seed
+
+    def set_global_distance_to_leading_vehicle(self, distance):
+        pass
+
+    def auto_lane_change(self, actor, enable):
+        pass
+
+    def set_path(self, actor, path):
+        actor._path = list(path)
+        actor._path_index = 0
+
+
+class Client(object):
+    """Every host:port is its own fake server, shared by the clients in a process."""
+
+    _servers = {}
+
+    def __init__(self, host='127.0.0.1', port=2000, worker_threads=0):
+        self.host = host
+        self.port = port
+        key = (host, port)
+        if key not in Client._servers:
+            Client._servers[key] = {'world': World(), 'traffic_managers': {}, 'loads': 0}
+        self._server = Client._servers[key]
+
+    def set_timeout(self, seconds):
+        pass
+
+    def get_world(self):
+        return self._server['world']
+
+    def get_available_maps(self):
+        return ['/Game/Carla/Maps/Town%02d' % n for n in (1, 2, 3, 4, 5, 10)]
+
+    def load_world(self, map_name, reset_settings=True):
+        self._server['world'] = World(map_name.split('/')[-1])
+        self._server['loads'] += 1
+        return self._server['world']
+
+    def apply_batch(self, commands):
+        self.apply_batch_sync(commands)
+
+    def apply_batch_sync(self, commands, do_tick=False):
+        world = self._server['world']
+        responses = [_apply_command(world, cmd) for cmd in commands]
+        if do_tick:
+            world.tick()
+        return responses
+
+    def get_trafficmanager(self, port=8000):
+        managers = self._server['traffic_managers']
+        if port not in managers:
+            managers[port] = TrafficManager(port)
+        return managers[port]
+
+
+def install():
+    """Register this module as carla and return it."""
+    module = sys.modules[__name__]
+    sys.modules['carla'] = module
+    sys.modules['carla.command'] = command
+    return module
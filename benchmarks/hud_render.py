@@ -0,0 +1,104 @@
+"""
+Micro-benchmark of HUD.render, with and without the text render cache.
+
+The HUD is ticked on a World driving on the fake server, so the panel is
+the one HUD.tick builds; only HUD.render is timed.
+
+    python -m benchmarks.hud_render --frames 2000
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks import fake_carla
+
+fake_carla.install()
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from benchmarks.run import live_world
+from hud import HUD
+
+
+class UncachedHUD(HUD):
+    """HUD.render as before the caches: every line rasterized, a new panel background every frame."""
+
+    def __init__(self, width, height):
+        super(UncachedHUD, self).__init__(width, height, text_cache_size=0)
+
+    @property
+    def _info_surface(self):
+        surface = pygame.Surface((220, self.dim[1]))
+        surface.set_alpha(100)
+        return surface
+
+    @_info_surface.setter
+    def _info_surface(self, surface):
+        pass
+
+
+def time_render(sim_world, world, hud, display, frames):
+    sim_world.on_tick(hud.on_world_tick)
+    clock = pygame.time.Clock()
+    elapsed = 0.0
+    for frame in range(frames):
+        sim_world.tick()
+        clock.tick()
+        hud.tick(world, clock)
+        start = time.perf_counter()
+        hud.render(display)
+        elapsed += time.perf_counter() - start
+    return 1e3 * elapsed / frames
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument(
+        '--res',
+        metavar='WIDTHxHEIGHT',
+        default='1280x720',
+        help='window resolution (default: 1280x720)')
+    argparser.add_argument(
+        '--frames',
+        default=2000,
+        type=int,
+        help='frames rendered per run (default: 2000)')
+    argparser.add_argument(
+        '--vehicles',
+        default=10,
+        type=int,
+        help='other vehicles around for the nearby vehicles list (default: 10)')
+    args = argparser.parse_args()
+    width, height = [int(x) for x in args.res.split('x')]
+
+    config = {
+        'width': 640,
+        'height': 480,
+        'window': args.res,
+        'num_cams': 1,
+        'encoder': 'jpeg',
+        'vehicles': args.vehicles}
+    output_dir = tempfile.mkdtemp(prefix='vpr-bench-')
+    world = None
+    try:
+        sim_world, world, display = live_world(config, output_dir)
+        uncached = time_render(sim_world, world, UncachedHUD(width, height), display, args.frames)
+        hud = HUD(width, height)
+        cached = time_render(sim_world, world, hud, display, args.frames)
+        print('HUD.render without cache: %.3f ms/frame' % uncached)
+        print('HUD.render with cache:    %.3f ms/frame (%d hits, %d misses)' % (
+            cached, hud._text_cache.hits, hud._text_cache.misses))
+    finally:
+        if world is not None:
+            world.destroy()
+        pygame.quit()
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+
+    main()
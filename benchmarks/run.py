@@ -0,0 +1,324 @@
+"""
+Offline benchmark suite of the collector's hot paths, no CARLA server needed.
+
+Every stage runs in its own process against the fake carla module of
+benchmarks/fake_carla.py, on synthetic frames of the given resolution:
+
+    recorder      DataRecorder.data_processing for every camera of the rig,
+                  fps includes draining the writer threads
+    parse_image   CameraManager._parse_image and the preview conversion
+    hud_tick      HUD.tick on a live World
+    hud_render    HUD.render
+    weather       dynamic_weather.Weather.tick
+    timeline      dynamic_weather.WeatherTimeline.lookup
+
+    python -m benchmarks.run --res 1280x720 --num-cams 3 --frames 500 -o report.json
+    python -m benchmarks.run --baseline old.json
+
+The JSON report holds frames/s, p50/p99/mean latency per frame and the peak
+RSS of every stage, plus the git commit, so runs can be compared across
+commits with --baseline.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import weakref
+
+import numpy as np
+
+
+STAGES = ('recorder', 'parse_image', 'hud_tick', 'hud_render', 'weather', 'timeline')
+
+
+# ==============================================================================
+# -- Stages --------------------------------------------------------------------
+# ==============================================================================
+
+
+def paced(frames, fps):
+    """Yield frame numbers, at most fps per second when fps is set."""
+    start = time.perf_counter()
+    for n in range(frames):
+        if fps:
+            delay = start + n / float(fps) - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        yield n
+
+
+def collector_args(config, output_dir):
+    import main
+    return main.parse_args([
+        '--res', config['window'],
+        '--camres', '%dx%d' % (config['width'], config['height']),
+        '--num-cams', str(config['num_cams']),
+        '--output-dir', output_dir,
+        '--encoder', config['encoder']])
+
+
+def live_world(config, output_dir, hud=True):
+    """A World with HUD and spectator camera on a fake server, ready to tick."""
+    import carla
+    import main
+    args = collector_args(config, output_dir)
+    client = carla.Client()
+    sim_world = client.get_world()
+    main.enable_sync_mode(client, sim_world, args)
+    display = None
+    if hud:
+        import pygame
+        from hud import HUD
+        pygame.init()
+        pygame.font.init()
+        display = pygame.display.set_mode((args.width, args.height))
+        hud = HUD(args.width, args.height)
+    else:
+        hud = None
+    world = main.World(sim_world, hud, args, client)
+    # Some traffic for the nearby vehicles list.
+    blueprint = sim_world.get_blueprint_library().find('vehicle.audi.tt')
+    for spawn_point in sim_world.get_map().get_spawn_points()[:config['vehicles']]:
+        sim_world.spawn_actor(blueprint, spawn_point).set_autopilot(True)
+    return sim_world, world, display
+
+
+def stage_recorder(config, output_dir):
+    import carla
+    import main
+    from main import DataRecorder
+    cameras = ['cam%d' % (n + 1) for n in range(config['num_cams'])]
+    recorder = DataRecorder(
+        output_dir, config['width'], config['height'], cameras=cameras, encoder=config['encoder'])
+    latencies = []
+    start = time.perf_counter()
+    for n in paced(config['frames'], config['fps']):
+        main.loc = carla.Transform(carla.Location(x=0.5 * n), carla.Rotation(yaw=0.1 * n))
+        images = [carla.Image(n, 0.05 * n, config['width'], config['height']) for _ in cameras]
+        t0 = time.perf_counter()
+        for camera, image in zip(cameras, images):
+            recorder.data_processing(image, camera, True)
+        latencies.append(time.perf_counter() - t0)
+    recorder.close()
+    return latencies, time.perf_counter() - start
+
+
+def stage_parse_image(config, output_dir):
+    import carla
+    from camera import CameraManager
+    sim_world, world, display = live_world(config, output_dir)
+    manager = world.camera_manager
+    weak = weakref.ref(manager)
+    latencies = []
+    start = time.perf_counter()
+    for n in paced(config['frames'], config['fps']):
+        image = carla.Image(n, 0.05 * n, *[int(x) for x in config['window'].split('x')])
+        t0 = time.perf_counter()
+        CameraManager._parse_image(weak, image)
+        manager.render(display)
+        latencies.append(time.perf_counter() - t0)
+    seconds = time.perf_counter() - start
+    world.destroy()
+    return latencies, seconds
+
+
+def stage_hud(config, output_dir, part):
+    import pygame
+    sim_world, world, display = live_world(config, output_dir)
+    clock = pygame.time.Clock()
+    latencies = []
+    start = time.perf_counter()
+    for n in paced(config['frames'], config['fps']):
+        sim_world.tick()
+        clock.tick()
+        t0 = time.perf_counter()
+        if part == 'tick':
+            world.hud.tick(world, clock)
+        else:
+            world.hud.render(display)
+        latencies.append(time.perf_counter() - t0)
+        if part == 'render':
+            world.hud.tick(world, clock)
+    seconds = time.perf_counter() - start
+    world.destroy()
+    return latencies, seconds
+
+
+def stage_weather(config, output_dir):
+    import carla
+    from dynamic_weather import Weather, weather_values
+    weather = Weather(carla.WeatherParameters())
+    latencies = []
+    start = time.perf_counter()
+    for n in paced(config['frames'], config['fps']):
+        t0 = time.perf_counter()
+        weather.tick(0.05)
+        weather_values(weather.weather)
+        latencies.append(time.perf_counter() - t0)
+    return latencies, time.perf_counter() - start
+
+
+def stage_timeline(config, output_dir):
+    from dynamic_weather import WeatherTimeline
+    timeline = WeatherTimeline(config['frames'] * 0.05, step=0.05)
+    latencies = []
+    start = time.perf_counter()
+    for n in paced(config['frames'], config['fps']):
+        t0 = time.perf_counter()
+        timeline.lookup(0.05 * n)
+        latencies.append(time.perf_counter() - t0)
+    return latencies, time.perf_counter() - start
+
+
+def run_stage(name, config):
+    """Runs in a fresh process, so the peak RSS is the stage's own."""
+    from benchmarks import fake_carla
+    fake_carla.install()
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    sys.stdout = open(os.devnull, 'w')
+    output_dir = tempfile.mkdtemp(prefix='vpr-bench-')
+    try:
+        if name == 'recorder':
+            latencies, seconds = stage_recorder(config, output_dir)
+        elif name == 'parse_image':
+            latencies, seconds = stage_parse_image(config, output_dir)
+        elif name in ('hud_tick', 'hud_render'):
+            latencies, seconds = stage_hud(config, output_dir, name[4:])
+        elif name == 'weather':
+            latencies, seconds = stage_weather(config, output_dir)
+        else:
+            latencies, seconds = stage_timeline(config, output_dir)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    latencies = np.array(latencies) * 1e3
+    return {
+        'frames': len(latencies),
+        'fps': len(latencies) / seconds,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'mean_ms': float(latencies.mean()),
+        # ru_maxrss is in KB on Linux and in bytes on macOS.
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (
+            1024.0 ** 2 if sys.platform == 'darwin' else 1024.0)}
+
+
+# ==============================================================================
+# -- main() --------------------------------------------------------------------
+# ==============================================================================
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description='Benchmark the collector without a CARLA server')
+    argparser.add_argument(
+        '--stages',
+        nargs='+',
+        choices=STAGES,
+        default=list(STAGES),
+        help='stages to run (default: all)')
+    argparser.add_argument(
+        '--res',
+        metavar='WIDTHxHEIGHT',
+        default='640x480',
+        help='camera resolution (default: 640x480)')
+    argparser.add_argument(
+        '--window',
+        metavar='WIDTHxHEIGHT',
+        default='1280x720',
+        help='window and spectator camera resolution (default: 1280x720)')
+    argparser.add_argument(
+        '--num-cams',
+        default=3,
+        type=int,
+        help='cameras of the rig (default: 3)')
+    argparser.add_argument(
+        '--frames',
+        default=300,
+        type=int,
+        help='frames per stage (default: 300)')
+    argparser.add_argument(
+        '--fps',
+        default=0.0,
+        type=float,
+        help='feed frames at this rate instead of as fast as possible')
+    argparser.add_argument(
+        '--encoder',
+        default='jpeg',
+        help='encoder of the recorder stage (default: jpeg)')
+    argparser.add_argument(
+        '--vehicles',
+        default=10,
+        type=int,
+        help='other vehicles around for the HUD stages (default: 10)')
+    argparser.add_argument(
+        '-o', '--output',
+        metavar='FILE',
+        default=None,
+        help='write the JSON report to FILE')
+    argparser.add_argument(
+        '--baseline',
+        metavar='FILE',
+        default=None,
+        help='earlier report to compare frames/s against')
+    args = argparser.parse_args()
+
+    width, height = [int(x) for x in args.res.split('x')]
+    config = {
+        'width': width,
+        'height': height,
+        'window': args.window,
+        'num_cams': args.num_cams,
+        'frames': args.frames,
+        'fps': args.fps,
+        'encoder': args.encoder,
+        'vehicles': args.vehicles}
+    report = {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'config': config,
+        'stages': {}}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['stages']
+
+    context = multiprocessing.get_context('spawn')
+    print('%-12s %10s %10s %10s %10s' % ('stage', 'frames/s', 'p50 ms', 'p99 ms', 'peak MB'))
+    for name in args.stages:
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as pool:
+            result = pool.submit(run_stage, name, config).result()
+        report['stages'][name] = result
+        line = '%-12s %10.1f %10.3f %10.3f %10.1f' % (
+            name, result['fps'], result['p50_ms'], result['p99_ms'], result['peak_rss_mb'])
+        if baseline and name in baseline:
+            line += '  %+6.1f%% frames/s' % (100.0 * (result['fps'] / baseline[name]['fps'] - 1.0))
+        print(line)
+        sys.stdout.flush()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,119 @@
+import collections
+import threading
+import time
+
+
+# ==============================================================================
+# -- SensorSchedule ------------------------------------------------------------
+# ==============================================================================
+
+
+class SensorSchedule(object):
+    """Which sensors of a rig are due to deliver on a frame.
+
+    A sensor's step is the number of simulator frames between two of its
+    images, sensor_tick / fixed_delta_seconds, 1 by default. A sensor with a
+    larger step is due every step frames counted from the last image it
+    delivered, and not before its first one. Sensors whose step is None
+    (not known, e.g. a sensor_tick in asynchronous mode) are never due.
+    """
+
+    def __init__(self, sensors):
+        self.sensors = list(sensors)
+        self._steps = {}
+        self._last = {}
+
+    def set_step(self, sensor, step=1):
+        """Step of a newly spawned sensor."""
+        self._last.pop(sensor, None)
+        if step == 1:
+            self._steps.pop(sensor, None)
+        else:
+            self._steps[sensor] = step
+
+    def seen(self, sensor, frame):
+        if sensor in self._steps and frame > self._last.get(sensor, frame - 1):
+            self._last[sensor] = frame
+
+    def due(self, frame):
+        if not self._steps:
+            return self.sensors
+        due = []
+        for sensor in self.sensors:
+            step = self._steps.get(sensor, 1)
+            if step == 1:
+                due.append(sensor)
+            elif step is not None and sensor in self._last and (frame - self._last[sensor]) % step == 0:
+                due.append(sensor)
+        return due
+
+    def ready(self, frame, delivered):
+        """Whether every sensor due on frame is in delivered."""
+        return all(sensor in delivered for sensor in self.due(frame))
+
+
+# ==============================================================================
+# -- FrameBundler --------------------------------------------------------------
+# ==============================================================================
+
+
+class FrameBundler(object):
+    """Groups the images of a camera rig that belong to the same frame.
+
+    Images are collected per image.frame. A bundle is handed to on_bundle
+    once every camera due on its frame (see SensorSchedule) has delivered,
+    or as incomplete when it has waited longer than timeout seconds.
+    on_bundle(frame, images, complete) is called outside the lock, with
+    images mapping camera name to image.
+    """
+
+    def __init__(self, cameras, on_bundle, timeout=0.5, schedule=None):
+        self.cameras = list(cameras)
+        self.schedule = schedule if schedule is not None else SensorSchedule(cameras)
+        self.on_bundle = on_bundle
+        self.timeout = timeout
+        self.complete = 0
+        self.incomplete = 0
+        self.missing = collections.Counter()
+        self._pending = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, camera, image):
+        ready = []
+        now = time.time()
+        with self._lock:
+            self.schedule.seen(camera, image.frame)
+            if image.frame not in self._pending:
+                self._pending[image.frame] = (now, {})
+            images = self._pending[image.frame][1]
+            images[camera] = image
+            if self.schedule.ready(image.frame, images):
+                del self._pending[image.frame]
+                self.complete += 1
+                ready.append((image.frame, images, True))
+            # Bundles are created in frame order, so the stale ones are first.
+            while self._pending:
+                frame, (first_seen, images) = next(iter(self._pending.items()))
+                if now - first_seen < self.timeout:
+                    break
+                del self._pending[frame]
+                ready.append((frame, images, False))
+                self._count_incomplete(frame, images)
+        for bundle in ready:
+            self.on_bundle(*bundle)
+
+    def flush(self):
+        """Hand over every pending bundle, complete or not."""
+        with self._lock:
+            pending = list(self._pending.items())
+            self._pending.clear()
+            for frame, (_, images) in pending:
+                self._count_incomplete(frame, images)
+        for frame, (_, images) in pending:
+            self.on_bundle(frame, images, False)
+
+    def _count_incomplete(self, frame, images):
+        self.incomplete += 1
+        for camera in self.schedule.due(frame):
+            if camera not in images:
+                self.missing[camera] += 1
@@ -1,5 +1,6 @@
 import pygame
 import carla
+import time
 import weakref
 import numpy as np
 
@@ -16,6 +17,14 @@ class CameraManager(object):
         self._parent = parent_actor
         self.hud = hud
         self.recording = False
+        # The sensor callback only keeps the latest image, render() turns it
+        # into a surface once per client frame. Images replaced before they
+        # were shown are counted as dropped.
+        self._image = None
+        self._surface_image = None
+        self.conversions = 0
+        self.convert_time = 0.0
+        self.dropped = 0
         bound_x = 0.5 + self._parent.bounding_box.extent.x
         bound_y = 0.5 + self._parent.bounding_box.extent.y
         bound_z = 0.5 + self._parent.bounding_box.extent.z
@@ -75,24 +84,40 @@ class CameraManager(object):
         #print('Recording %s' % ('On' if self.recording else 'Off'))
 
     def render(self, display):
+        image = self._image
+        if image is not None:
+            self._image = None
+            start = time.perf_counter()
+            self.surface = self._make_surface(image)
+            self.convert_time += time.perf_counter() - start
+            self.conversions += 1
         if self.surface is not None:
             display.blit(self.surface, (0, 0))
 
-    @staticmethod
-    def _parse_image(weak_self, image):
-        self = weak_self()
-        if not self:
-            return
+    @property
+    def mean_convert_time(self):
+        return self.convert_time / self.conversions if self.conversions else 0.0
 
-        else:
-            # image.convert(self.sensors[self.index][1])
+    def _make_surface(self, image):
+        try:
+            # The surface shares the BGRA buffer of the image, no copies.
+            # Keep the image alive for as long as the surface is shown.
+            surface = pygame.image.frombuffer(image.raw_data, (image.width, image.height), 'BGRA')
+            self._surface_image = image
+            return surface
+        except ValueError:
+            # pygame older than 2.1.3 has no BGRA buffers.
             array = np.frombuffer(image.raw_data, dtype=np.dtype("uint8"))
             array = np.reshape(array, (image.height, image.width, 4))
             array = array[:, :, :3]
             array = array[:, :, ::-1]
-            self.surface = pygame.surfarray.make_surface(array.swapaxes(0, 1))
+            return pygame.surfarray.make_surface(array.swapaxes(0, 1))
 
-            
-        loc = self._parent.get_transform()
-        # print(loc) 
-        # print(loc.location.x, loc.location.y, loc.rotation.yaw) # .location.x
\ No newline at end of file
+    @staticmethod
+    def _parse_image(weak_self, image):
+        self = weak_self()
+        if not self:
+            return
+        if self._image is not None:
+            self.dropped += 1
+        self._image = image
@@ -0,0 +1,50 @@
+import math
+import threading
+
+
+# ==============================================================================
+# -- CaptureGate ---------------------------------------------------------------
+# ==============================================================================
+
+
+class CaptureGate(object):
+    """Decides whether a frame is spatially new enough to be saved.
+
+    A frame passes when the vehicle moved at least min_distance metres or
+    turned at least min_yaw degrees since the last frame that passed. A
+    threshold of 0 disables that test, with both at 0 every frame passes.
+    Bundles are checked from several sensor threads, accept() is locked.
+    """
+
+    def __init__(self, min_distance=0.0, min_yaw=0.0):
+        self.min_distance = min_distance
+        self.min_yaw = min_yaw
+        self.accepted = 0
+        self.skipped = 0
+        self.skipped_images = 0
+        self._last = None
+        self._lock = threading.Lock()
+
+    def accept(self, pose, images=1):
+        """Check the pose (a carla.Transform) of a frame of `images` images."""
+        with self._lock:
+            return self._accept(pose, images)
+
+    def _accept(self, pose, images):
+        if pose is None or (self.min_distance <= 0.0 and self.min_yaw <= 0.0):
+            self.accepted += 1
+            return True
+        x, y, yaw = pose.location.x, pose.location.y, pose.rotation.yaw
+        if self._last is not None:
+            last_x, last_y, last_yaw = self._last
+            moved = self.min_distance > 0.0 and \
+                math.hypot(x - last_x, y - last_y) >= self.min_distance
+            turned = self.min_yaw > 0.0 and \
+                abs((yaw - last_yaw + 180.0) % 360.0 - 180.0) >= self.min_yaw
+            if not (moved or turned):
+                self.skipped += 1
+                self.skipped_images += images
+                return False
+        self._last = (x, y, yaw)
+        self.accepted += 1
+        return True
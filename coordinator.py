@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+
+"""
+Fan collection jobs out across several CARLA servers.
+
+Every server (HOST:PORT:TM_PORT) gets a worker process that runs headless
+collection jobs one after the other. Jobs are handed to the worker already
+on the same town when possible, so load_world is only called when a
+worker has to switch towns. Every job is a collector session OUTPUT/<id>
+with a manifest.json, merged into OUTPUT/manifest.json at the end. Failed
+jobs are retried, resuming the session the failed attempt left behind.
+
+The job file is JSON (or YAML if PyYAML is installed), a list of jobs or
+{"output": DIR, "jobs": [...]}:
+
+    [{"name": "t01-clear", "town": "Town01", "weather": "ClearNoon",
+      "frames": 2000, "seed": 1, "num_cams": 3},
+     {"town": "Town02", "weather": "WetSunset", "duration": 120}]
+
+Any other collector flag can be given per job as "args": ["--min-distance", "2"].
+
+    python coordinator.py jobs.json --servers 127.0.0.1:2000:8000 127.0.0.1:2002:8002
+
+--fake-server runs the workers against benchmarks/fake_carla.py instead of a
+real simulator, to try a job file or the coordinator itself.
+"""
+
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+
+from sessions import session_progress
+
+
+# ==============================================================================
+# -- Jobs ----------------------------------------------------------------------
+# ==============================================================================
+
+
+def load_jobs(path):
+    with open(path) as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    if isinstance(spec, dict):
+        output, jobs = spec.get('output'), spec['jobs']
+    else:
+        output, jobs = None, spec
+    for n, job in enumerate(jobs):
+        if 'id' not in job:
+            job['id'] = job.get('name') or '%03d-%s-%s' % (
+                n, job.get('town') or 'current', job.get('weather') or 'default')
+    return output, jobs
+
+
+def parse_server(text):
+    host, port, tm_port = text.rsplit(':', 2)
+    return host, int(port), int(tm_port)
+
+
+def job_argv(job, server, output_dir, resume=False, progress=(0, 0.0)):
+    """Command line of the collector for one job on one server.
+
+    A resumed job only gets the frames and duration its session has not
+    been through yet, progress is what session_progress() returns for it.
+    """
+    host, port, tm_port = server
+    argv = [
+        '--headless',
+        '--host', host,
+        '--port', str(port),
+        '--tm-port', str(tm_port),
+        '--output-dir', output_dir,
+        '--session', job['id']]
+    if resume:
+        argv.append('--resume')
+    ticks, seconds = progress
+    if job.get('frames') is not None:
+        argv += ['--frames', str(max(job['frames'] - ticks, 0))]
+    if job.get('duration') is not None:
+        argv += ['--duration', str(max(job['duration'] - seconds, 0.0))]
+    for key, flag in (('weather', '--weather'), ('seed', '--seed'), ('num_cams', '--num-cams'),
+                      ('camres', '--camres')):
+        if job.get(key) is not None:
+            argv += [flag, str(job[key])]
+    return argv + [str(arg) for arg in job.get('args', [])]
+
+
+# ==============================================================================
+# -- Worker --------------------------------------------------------------------
+# ==============================================================================
+
+
+def worker_main(worker_id, server, output_dir, jobs, results, fake_server):
+    """Runs in its own process, bound to one server for its whole life."""
+    if fake_server:
+        from benchmarks import fake_carla
+        fake_carla.install()
+    import carla
+    import main as collector
+
+    client = carla.Client(server[0], server[1])
+    client.set_timeout(60.0)
+    town = client.get_world().get_map().name.split('/')[-1]
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        job_dir = os.path.join(output_dir, job['id'])
+        started = time.time()
+        loaded = False
+        try:
+            if job.get('town') and job['town'] != town:
+                town = None
+                client.load_world(job['town'])
+                town, loaded = job['town'], True
+            # A retry carries on in the session of the failed attempt, with
+            # what is left of the job's budget.
+            resume = os.path.isdir(job_dir)
+            progress = session_progress(job_dir) if resume else (0, 0.0)
+            args = collector.parse_args(job_argv(job, server, output_dir, resume, progress))
+            if args.replay_route:
+                stats = collector.replay_loop(args, client)
+            else:
+                stats = collector.headless_loop(args, client)
+            manifest = {
+                'job': job,
+                'server': '%s:%d' % server[:2],
+                'town': town,
+                'loaded_world': loaded,
+                'output_dir': job_dir,
+                'started': started,
+                'finished': time.time(),
+                'stats': stats}
+            with open(os.path.join(job_dir, 'manifest.json'), 'w') as f:
+                json.dump(manifest, f, indent=2)
+            results.put(('done', worker_id, job['id'], manifest))
+        except Exception:
+            # The server may be half way through a load, reload next time.
+            town = None
+            results.put(('failed', worker_id, job['id'], traceback.format_exc()))
+
+
+# ==============================================================================
+# -- Coordinator ---------------------------------------------------------------
+# ==============================================================================
+
+
+class Coordinator(object):
+    def __init__(self, jobs, servers, output_dir, retries=2, fake_server=False):
+        self.jobs = {job['id']: job for job in jobs}
+        self.servers = servers
+        self.output_dir = output_dir
+        self.retries = retries
+        self.fake_server = fake_server
+        self.attempts = collections.Counter()
+        self.done = {}
+        self.failed = {}
+        # Grouped by town, so consecutive jobs of a worker share the map.
+        self._pending = sorted(jobs, key=lambda job: job.get('town') or '')
+        self._context = multiprocessing.get_context('spawn')
+        self._results = self._context.Queue()
+        self._workers = []
+
+    def run(self):
+        if not os.path.isdir(self.output_dir):
+            os.makedirs(self.output_dir)
+        self._workers = [self._start_worker(n) for n in range(len(self.servers))]
+        try:
+            while self._pending or any(worker['job'] for worker in self._workers):
+                for worker in self._workers:
+                    if worker['job'] is None and self._pending:
+                        self._assign(worker)
+                try:
+                    status, worker_id, job_id, result = self._results.get(timeout=1.0)
+                except queue.Empty:
+                    self._check_workers()
+                    continue
+                worker = self._workers[worker_id]
+                worker['job'] = None
+                if status == 'done':
+                    self.done[job_id] = result
+                    print('[%s] done on %s:%d' % ((job_id,) + self.servers[worker_id][:2]))
+                else:
+                    worker['town'] = None
+                    self._retry(job_id, result)
+        finally:
+            for worker in self._workers:
+                if worker['process'].is_alive():
+                    worker['queue'].put(None)
+            for worker in self._workers:
+                worker['process'].join(30.0)
+        return self.merge_manifests()
+
+    def merge_manifests(self):
+        manifest = {
+            'jobs': [self.done[job_id] for job_id in self.jobs if job_id in self.done],
+            'failed': [
+                {'job': self.jobs[job_id], 'attempts': self.attempts[job_id], 'error': error}
+                for job_id, error in self.failed.items()],
+            'town_loads': sum(1 for job in self.done.values() if job['loaded_world'])}
+        path = os.path.join(self.output_dir, 'manifest.json')
+        with open(path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    def _start_worker(self, worker_id):
+        jobs = self._context.Queue()
+        process = self._context.Process(
+            target=worker_main,
+            args=(worker_id, self.servers[worker_id], self.output_dir, jobs, self._results, self.fake_server),
+            name='collector-%d' % worker_id)
+        process.daemon = True
+        process.start()
+        return {'process': process, 'queue': jobs, 'town': None, 'job': None}
+
+    def _assign(self, worker):
+        job = self._next_job(worker)
+        self._pending.remove(job)
+        self.attempts[job['id']] += 1
+        worker['job'] = job['id']
+        worker['town'] = job.get('town') or worker['town']
+        worker['queue'].put(job)
+
+    def _next_job(self, worker):
+        for job in self._pending:
+            if job.get('town') == worker['town']:
+                return job
+        # Start the biggest town group nobody else is working on.
+        busy = set(other['town'] for other in self._workers if other is not worker and other['job'])
+        groups = collections.Counter(job.get('town') for job in self._pending)
+        town = max(groups, key=lambda town: (town not in busy, groups[town]))
+        return next(job for job in self._pending if job.get('town') == town)
+
+    def _retry(self, job_id, error):
+        if self.attempts[job_id] <= self.retries:
+            print('[%s] failed, retrying (%d/%d)' % (job_id, self.attempts[job_id], self.retries))
+            self._pending.insert(0, self.jobs[job_id])
+        else:
+            print('[%s] failed after %d attempts:\n%s' % (job_id, self.attempts[job_id], error))
+            self.failed[job_id] = error
+
+    def _check_workers(self):
+        for worker_id, worker in enumerate(self._workers):
+            if not worker['process'].is_alive():
+                job_id = worker['job']
+                self._workers[worker_id] = self._start_worker(worker_id)
+                if job_id is not None:
+                    self._retry(job_id, 'worker process died (exit code %s)' % worker['process'].exitcode)
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description='Run collection jobs on several CARLA servers')
+    argparser.add_argument(
+        'jobs',
+        help='job file, JSON or YAML')
+    argparser.add_argument(
+        '--servers',
+        metavar='HOST:PORT:TM_PORT',
+        nargs='+',
+        default=['127.0.0.1:2000:8000'],
+        help='one worker per server (default: 127.0.0.1:2000:8000)')
+    argparser.add_argument(
+        '-o', '--output',
+        metavar='DIR',
+        default=None,
+        help='root directory of the job outputs (default: from the job file, or runs)')
+    argparser.add_argument(
+        '--retries',
+        default=2,
+        type=int,
+        help='times a failed job is tried again (default: 2)')
+    argparser.add_argument(
+        '--fake-server',
+        action='store_true',
+        help='run against the stub carla module instead of real servers')
+    args = argparser.parse_args()
+
+    output, jobs = load_jobs(args.jobs)
+    output_dir = args.output or output or 'runs'
+    servers = [parse_server(server) for server in args.servers]
+    coordinator = Coordinator(jobs, servers, output_dir, args.retries, args.fake_server)
+    manifest = coordinator.run()
+    print('%d jobs done, %d failed, manifest in %s' % (
+        len(manifest['jobs']), len(manifest['failed']), os.path.join(output_dir, 'manifest.json')))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,348 @@
+"""
+Coverage route over the road network of a town.
+
+The lanes of map.get_topology() form a directed graph: lane segments
+between junctions are the edges that have to be driven, junction
+connectors can be used to get from one to the next. plan_coverage() finds
+a closed drive over every lane segment reachable from the start, a
+(rural) Chinese postman tour:
+
+    1. keep the lanes in the strongly connected part of the town that
+       holds the start, the others can not be driven there and back
+    2. link the lanes into one piece, growing it from the start by the
+       shortest path to the nearest lane not yet linked
+    3. balance every node, adding the shortest paths from nodes with more
+       lanes in than out to nodes with more out than in, cheapest pairs
+       first (a greedy matching)
+    4. walk the resulting Eulerian multigraph (Hierholzer)
+
+The route is driven by the Traffic Manager (set_path) or by
+WaypointFollower, and CoverageTracker measures the share of lane length
+driven so far.
+"""
+
+import collections
+import heapq
+import math
+
+
+# ==============================================================================
+# -- Road graph ----------------------------------------------------------------
+# ==============================================================================
+
+
+class Segment(object):
+    """One lane of the topology, from node src to node dst along waypoints."""
+
+    def __init__(self, index, src, dst, waypoints, required):
+        self.index = index
+        self.src = src
+        self.dst = dst
+        self.waypoints = waypoints
+        self.required = required
+        start = waypoints[0]
+        self.key = (start.road_id, start.section_id, start.lane_id)
+        self.length = sum(
+            a.transform.location.distance(b.transform.location)
+            for a, b in zip(waypoints, waypoints[1:]))
+
+
+def node_key(location):
+    # Ends of consecutive lanes coincide up to float noise.
+    return (int(round(location.x)), int(round(location.y)), int(round(location.z)))
+
+
+def build_graph(carla_map, resolution=2.0):
+    """Segments of the map's topology, lanes inside junctions are not required."""
+    segments = []
+    for start, end in carla_map.get_topology():
+        end_location = end.transform.location
+        waypoints = [start]
+        waypoint = start.next(resolution)
+        while waypoint and waypoint[0].transform.location.distance(end_location) > resolution:
+            waypoints.append(waypoint[0])
+            waypoint = waypoint[0].next(resolution)
+        waypoints.append(end)
+        segments.append(Segment(
+            len(segments), node_key(start.transform.location), node_key(end_location),
+            waypoints, not start.is_junction))
+    return segments
+
+
+def shortest_paths(segments, source, reverse=False):
+    """Dijkstra from source, a node or a set of nodes: (distance, last segment) by node.
+
+    With reverse the distances are the ones to source.
+    """
+    edges = collections.defaultdict(list)
+    for segment in segments:
+        if reverse:
+            edges[segment.dst].append((segment.src, segment))
+        else:
+            edges[segment.src].append((segment.dst, segment))
+    sources = [source] if isinstance(source, tuple) else sorted(source)
+    distance = dict((node, 0.0) for node in sources)
+    via = dict((node, None) for node in sources)
+    heap = [(0.0, n, node) for n, node in enumerate(sources)]
+    count = len(heap)
+    while heap:
+        d, _, node = heapq.heappop(heap)
+        if d > distance[node]:
+            continue
+        for other, segment in edges[node]:
+            nd = d + segment.length
+            if nd < distance.get(other, float('inf')):
+                distance[other] = nd
+                via[other] = segment
+                heapq.heappush(heap, (nd, count, other))
+                count += 1
+    return distance, via
+
+
+def path_to(via, node):
+    """Segments of the shortest path to node."""
+    path = []
+    while via[node] is not None:
+        path.append(via[node])
+        node = via[node].src
+    return path[::-1]
+
+
+# ==============================================================================
+# -- Planner -------------------------------------------------------------------
+# ==============================================================================
+
+
+class CoveragePlan(object):
+    """The tour: segments in driving order, what they cover and what was left out."""
+
+    def __init__(self, tour, required, unreachable):
+        self.tour = tour
+        self.required = required
+        self.unreachable = unreachable
+        self.length = sum(segment.length for segment in tour)
+        self.required_length = sum(segment.length for segment in required)
+
+    @property
+    def overhead(self):
+        """Distance driven per metre of lane covered."""
+        return self.length / self.required_length if self.required_length else 0.0
+
+    def waypoints(self):
+        waypoints = []
+        for segment in self.tour:
+            # The first waypoint of a lane is the last of the one before.
+            waypoints += segment.waypoints[1 if waypoints else 0:]
+        return waypoints
+
+    def locations(self):
+        """Ends of the tour's segments, the decision points for Traffic Manager paths."""
+        return [segment.waypoints[-1].transform.location for segment in self.tour]
+
+
+def plan_coverage(carla_map, start_location, resolution=2.0, segments=None):
+    """A closed tour covering every drivable lane reachable from start_location.
+
+    The tour starts on the nearest lane that can be driven there and back.
+    Without one the plan is empty, every lane is in its unreachable list.
+    """
+    if segments is None:
+        segments = build_graph(carla_map, resolution)
+    candidates = [segment for segment in segments if segment.required]
+    candidates.sort(key=lambda segment: segment.waypoints[0].transform.location.distance(start_location))
+
+    # 1. Lanes we can get to from the start and back from. A lane coming in
+    # from the edge of the map is no start, try the next nearest one.
+    for candidate in candidates:
+        start = candidate.src
+        forward, _ = shortest_paths(segments, start)
+        backward, _ = shortest_paths(segments, start, reverse=True)
+        reachable = set(forward) & set(backward)
+        if candidate.dst in reachable:
+            break
+    else:
+        return CoveragePlan([], [], candidates)
+    required = [s for s in candidates if s.src in reachable and s.dst in reachable]
+    unreachable = [s for s in candidates if not (s.src in reachable and s.dst in reachable)]
+
+    # 2. One piece: then the balanced tour is a single closed walk.
+    tour = list(required)
+    components = circuits(tour)
+    linked = set(next(component for component in components if start in component))
+    components = [component for component in components if start not in component]
+    while components:
+        distance, via = shortest_paths(segments, linked)
+        node = min((node for component in components for node in component), key=distance.get)
+        path = path_to(via, node)
+        tour += path
+        linked.update(segment.dst for segment in path)
+        for component in [component for component in components if component & linked]:
+            linked |= component
+            components.remove(component)
+
+    # 3. Balance in and out degrees with the cheapest shortest paths.
+    balance = collections.Counter()
+    for segment in tour:
+        balance[segment.src] += 1
+        balance[segment.dst] -= 1
+    # More lanes in than out: the tour leaves these nodes again over extra paths.
+    sources = dict((node, -n) for node, n in balance.items() if n < 0)
+    sinks = dict((node, n) for node, n in balance.items() if n > 0)
+    pairs = []
+    routes = {}
+    for node in sources:
+        distance, via = shortest_paths(segments, node)
+        routes[node] = via
+        pairs += [(distance[sink], node, sink) for sink in sinks if sink in distance]
+    for _, node, sink in sorted(pairs):
+        while sources[node] and sinks[sink]:
+            tour += path_to(routes[node], sink)
+            sources[node] -= 1
+            sinks[sink] -= 1
+
+    # 4. Hierholzer.
+    return CoveragePlan(euler_circuit(tour, start), required, unreachable)
+
+
+def circuits(segments):
+    """Node sets of the weakly connected components of the segments."""
+    parent = {}
+
+    def find(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for segment in segments:
+        parent[find(segment.src)] = find(segment.dst)
+    components = collections.defaultdict(set)
+    for node in list(parent):
+        components[find(node)].add(node)
+    return list(components.values())
+
+
+def euler_circuit(segments, start):
+    """Segments in the order of a closed walk using each of them once, from start."""
+    out = collections.defaultdict(list)
+    for segment in reversed(segments):
+        out[segment.src].append(segment)
+    nodes = [start]
+    trail = []
+    circuit = []
+    while nodes:
+        if out[nodes[-1]]:
+            segment = out[nodes[-1]].pop()
+            nodes.append(segment.dst)
+            trail.append(segment)
+        else:
+            nodes.pop()
+            if trail:
+                circuit.append(trail.pop())
+    return circuit[::-1]
+
+
+# ==============================================================================
+# -- CoverageTracker -----------------------------------------------------------
+# ==============================================================================
+
+
+class CoverageTracker(object):
+    """Share of the lane length of a plan that has been driven.
+
+    Every lane is cut into bins of bin_size metres along the road, a bin is
+    covered once the vehicle was on it. update() takes the waypoint of the
+    vehicle, map.get_waypoint(location).
+    """
+
+    def __init__(self, segments, bin_size=5.0):
+        self.bin_size = bin_size
+        self.bins = {}
+        for segment in segments:
+            start, end = segment.waypoints[0].s, segment.waypoints[-1].s
+            first, last = int(min(start, end) // bin_size), int(max(start, end) // bin_size)
+            self.bins.setdefault(segment.key, set()).update(range(first, last + 1))
+        self.total = sum(len(bins) for bins in self.bins.values())
+        self.visited = collections.defaultdict(set)
+        self.covered = 0
+
+    def update(self, waypoint):
+        if waypoint is None:
+            return self.progress
+        key = (waypoint.road_id, waypoint.section_id, waypoint.lane_id)
+        bins = self.bins.get(key)
+        if bins is not None:
+            n = int(waypoint.s // self.bin_size)
+            if n in bins and n not in self.visited[key]:
+                self.visited[key].add(n)
+                self.covered += 1
+        return self.progress
+
+    @property
+    def progress(self):
+        return self.covered / float(self.total) if self.total else 1.0
+
+    def stats(self):
+        return {
+            'progress': self.progress,
+            'covered_m': self.covered * self.bin_size,
+            'total_m': self.total * self.bin_size,
+            'lanes': len(self.bins),
+            'lanes_done': sum(1 for key, bins in self.bins.items() if len(self.visited[key]) == len(bins))}
+
+
+# ==============================================================================
+# -- WaypointFollower ----------------------------------------------------------
+# ==============================================================================
+
+
+class WaypointFollower(object):
+    """Pure pursuit steering and proportional speed control along waypoints.
+
+    For servers whose Traffic Manager has no set_path: run_step() returns
+    the control for the next tick, done is set at the last waypoint.
+    """
+
+    def __init__(self, vehicle, waypoints, target_speed=30.0, lookahead=6.0, wheelbase=2.9,
+                 max_steer_angle=70.0):
+        self.vehicle = vehicle
+        self.waypoints = waypoints
+        self.target_speed = target_speed / 3.6
+        self.lookahead = lookahead
+        self.wheelbase = wheelbase
+        self.max_steer = math.radians(max_steer_angle)
+        self.index = 0
+        self.done = not waypoints
+
+    def run_step(self):
+        import carla
+        transform = self.vehicle.get_transform()
+        location = transform.location
+        # Only look a few waypoints ahead, the tour crosses itself.
+        window = self.waypoints[self.index:self.index + 20]
+        nearest = min(range(len(window)), key=lambda n: window[n].transform.location.distance(location))
+        self.index += nearest
+        while self.index < len(self.waypoints) - 1 and \
+                self.waypoints[self.index].transform.location.distance(location) < self.lookahead:
+            self.index += 1
+        target = self.waypoints[self.index].transform.location
+        if self.index == len(self.waypoints) - 1 and target.distance(location) < self.lookahead:
+            self.done = True
+            return carla.VehicleControl(brake=1.0)
+
+        yaw = math.radians(transform.rotation.yaw)
+        alpha = math.atan2(target.y - location.y, target.x - location.x) - yaw
+        alpha = math.atan2(math.sin(alpha), math.cos(alpha))
+        distance = max(target.distance(location), 1e-3)
+        steer = math.atan2(2.0 * self.wheelbase * math.sin(alpha), distance) / self.max_steer
+
+        velocity = self.vehicle.get_velocity()
+        speed = math.sqrt(velocity.x**2 + velocity.y**2 + velocity.z**2)
+        # Slow down for sharp turns.
+        target_speed = self.target_speed * max(0.4, 1.0 - abs(steer))
+        error = target_speed - speed
+        return carla.VehicleControl(
+            throttle=min(max(0.5 * error, 0.0), 0.75),
+            brake=min(max(-0.5 * error, 0.0), 1.0),
+            steer=min(max(steer, -1.0), 1.0))
@@ -30,6 +30,25 @@ import carla
 import argparse
 import math
 
+import numpy as np
+
+
+# Parameters driven by Weather, in the order they are stamped into frame
+# metadata by the collector.
+WEATHER_FIELDS = (
+    'cloudiness',
+    'precipitation',
+    'precipitation_deposits',
+    'wind_intensity',
+    'fog_density',
+    'wetness',
+    'sun_azimuth_angle',
+    'sun_altitude_angle')
+
+
+def weather_values(weather):
+    return tuple(float(getattr(weather, name)) for name in WEATHER_FIELDS)
+
 
 def clamp(value, minimum=0.0, maximum=100.0):
     return max(minimum, min(value, maximum))
@@ -104,6 +123,84 @@ class Weather(object):
         return '%s %s' % (self._sun, self._storm)
 
 
+# ==============================================================================
+# -- WeatherTimeline -----------------------------------------------------------
+# ==============================================================================
+
+
+STORM_MIN, STORM_MAX, STORM_RATE = -250.0, 100.0, 1.3
+
+
+def weather_timeline(times, azimuth=0.0, sun_phase=0.0, storm=-50.0):
+    """Closed form of Weather.tick for an array of (speed scaled) times.
+
+    Returns an array (len(times), len(WEATHER_FIELDS)). The storm state is a
+    triangle wave between STORM_MIN and STORM_MAX starting at storm on its
+    rising edge, the sun turns at the rates of Sun.tick.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    sun_t = (sun_phase + 0.008 * times) % (2.0 * math.pi)
+    sun_azimuth = (azimuth + 0.25 * times) % 360.0
+    sun_altitude = 70.0 * np.sin(sun_t) - 20.0
+
+    span = STORM_MAX - STORM_MIN
+    u = (storm - STORM_MIN + STORM_RATE * times) % (2.0 * span)
+    increasing = u < span
+    t = np.where(increasing, STORM_MIN + u, STORM_MAX - (u - span))
+    clouds = np.clip(t + 40.0, 0.0, 90.0)
+    rain = np.clip(t, 0.0, 80.0)
+    puddles = np.clip(t + np.where(increasing, -10.0, 90.0), 0.0, 85.0)
+    wetness = np.clip(t * 5.0, 0.0, 100.0)
+    wind = np.where(clouds <= 20.0, 5.0, np.where(clouds >= 70.0, 90.0, 40.0))
+    fog = np.clip(t - 10.0, 0.0, 30.0)
+    # Same order as WEATHER_FIELDS.
+    return np.stack([clouds, rain, puddles, wind, fog, wetness, sun_azimuth, sun_altitude], axis=-1)
+
+
+class WeatherTimeline(object):
+    """The weather of Weather over duration seconds, computed in one pass.
+
+    The starting state comes from weather, or is drawn from seed when one is
+    given, so the same seed always gives the same timeline. lookup(t) is a
+    table read; times past the table are evaluated in closed form.
+    """
+
+    def __init__(self, duration, speed=1.0, step=0.1, weather=None, seed=None):
+        self.speed = speed
+        self.step = step
+        if seed is not None:
+            rng = np.random.default_rng(seed)
+            self.start = (rng.uniform(0.0, 360.0), rng.uniform(0.0, 2.0 * math.pi),
+                          rng.uniform(STORM_MIN, STORM_MAX))
+        elif weather is not None:
+            precipitation = weather.precipitation
+            self.start = (weather.sun_azimuth_angle, 0.0, precipitation if precipitation > 0.0 else -50.0)
+        else:
+            self.start = (0.0, 0.0, -50.0)
+        times = np.arange(int(math.ceil(duration / step)) + 1) * step
+        self.values = weather_timeline(times * speed, *self.start).astype(np.float32)
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def duration(self):
+        return (len(self.values) - 1) * self.step
+
+    def lookup(self, t):
+        """Weather values at t seconds, in WEATHER_FIELDS order."""
+        n = int(t / self.step + 0.5)
+        if 0 <= n < len(self.values):
+            return tuple(float(v) for v in self.values[n])
+        return tuple(float(v) for v in weather_timeline(t * self.speed, *self.start))
+
+    def apply(self, weather, t):
+        """Set the parameters of a carla.WeatherParameters to the weather at t."""
+        for name, value in zip(WEATHER_FIELDS, self.lookup(t)):
+            setattr(weather, name, value)
+        return weather
+
+
 def main():
     argparser = argparse.ArgumentParser(
         description=__doc__)
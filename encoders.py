@@ -0,0 +1,141 @@
+"""
+Image encoders for the recorder.
+
+Every encoder takes a BGRA frame, the (H, W, 4) uint8 view of a CARLA image
+buffer, and returns the encoded bytes as a bytes-like object. The alpha
+channel is dropped by the codec itself where it can, so the frame is never
+copied to BGR first.
+
+    jpeg       OpenCV JPEG, quality 0-100 (default 95)
+    png        OpenCV PNG, compression level 0-9 (default 3)
+    webp       OpenCV WebP, quality 1-100, above 100 is lossless (default 90)
+    turbojpeg  libjpeg-turbo through PyTurboJPEG, quality 0-100 (default 95)
+    pil        Pillow (or Pillow-SIMD) JPEG, quality 0-100 (default 95)
+    raw        the BGRA buffer itself, no encoding
+"""
+
+import io
+
+import cv2
+import numpy as np
+
+
+# ==============================================================================
+# -- Encoders ------------------------------------------------------------------
+# ==============================================================================
+
+
+class CvJpegEncoder(object):
+    ext = 'jpg'
+
+    def __init__(self, quality=95):
+        self.quality = quality
+        self._params = [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+
+    def encode(self, bgra):
+        _, data = cv2.imencode('.jpg', bgra, self._params)
+        return memoryview(data.reshape(-1))
+
+
+class PngEncoder(object):
+    ext = 'png'
+
+    def __init__(self, level=3):
+        self.level = level
+        self._params = [cv2.IMWRITE_PNG_COMPRESSION, int(level)]
+
+    def encode(self, bgra):
+        # PNG would keep the constant alpha channel, drop it first.
+        _, data = cv2.imencode('.png', cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR), self._params)
+        return memoryview(data.reshape(-1))
+
+
+class WebpEncoder(object):
+    ext = 'webp'
+
+    def __init__(self, quality=90):
+        self.quality = quality
+        self._params = [cv2.IMWRITE_WEBP_QUALITY, int(quality)]
+
+    def encode(self, bgra):
+        _, data = cv2.imencode('.webp', bgra, self._params)
+        return memoryview(data.reshape(-1))
+
+
+class TurboJpegEncoder(object):
+    ext = 'jpg'
+
+    def __init__(self, quality=95):
+        from turbojpeg import TurboJPEG, TJPF_BGRA
+        self.quality = quality
+        self._jpeg = TurboJPEG()
+        self._pixel_format = TJPF_BGRA
+
+    def encode(self, bgra):
+        return self._jpeg.encode(bgra, quality=int(self.quality), pixel_format=self._pixel_format)
+
+
+class PilEncoder(object):
+    ext = 'jpg'
+
+    def __init__(self, quality=95):
+        from PIL import Image
+        self.quality = quality
+        self._image = Image
+
+    def encode(self, bgra):
+        height, width = bgra.shape[:2]
+        image = self._image.frombuffer('RGB', (width, height), bgra, 'raw', 'BGRX', 0, 1)
+        out = io.BytesIO()
+        image.save(out, 'JPEG', quality=int(self.quality))
+        return out.getbuffer()
+
+
+class RawEncoder(object):
+    ext = 'bgra'
+
+    def __init__(self):
+        pass
+
+    def encode(self, bgra):
+        return memoryview(np.ascontiguousarray(bgra)).cast('B')
+
+
+ENCODERS = {
+    'jpeg': CvJpegEncoder,
+    'png': PngEncoder,
+    'webp': WebpEncoder,
+    'turbojpeg': TurboJpegEncoder,
+    'pil': PilEncoder,
+    'raw': RawEncoder,
+}
+
+
+def make_encoder(name, quality=None, level=None):
+    """Encoder by name, quality and level only go to the backends that take them."""
+    cls = ENCODERS[name]
+    if cls is PngEncoder:
+        return cls() if level is None else cls(level)
+    if cls is RawEncoder or quality is None:
+        return cls()
+    return cls(quality)
+
+
+def available_encoders():
+    """Names of the encoders whose libraries can be loaded here."""
+    names = []
+    for name in ENCODERS:
+        try:
+            make_encoder(name)
+        except (ImportError, OSError, RuntimeError):
+            continue
+        names.append(name)
+    return names
+
+
+def decode(data, ext, width=None, height=None):
+    """BGR image back from the bytes of an encoder, raw frames need their size."""
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if ext == 'bgra':
+        return buffer.reshape((height, width, 4))[:, :, :3]
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
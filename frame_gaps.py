@@ -0,0 +1,175 @@
+import collections
+import json
+import threading
+
+
+# ==============================================================================
+# -- SensorGaps ----------------------------------------------------------------
+# ==============================================================================
+
+
+class SensorGaps(object):
+    """Frame accounting of one sensor.
+
+    step is the number of simulator frames between two images of the
+    sensor (1 with sensor_tick 0), None when that is not known, e.g. a
+    sensor_tick in asynchronous mode: such sensors are only counted.
+    """
+
+    def __init__(self, step=1, window=1000, max_gaps=10000):
+        self.step = step
+        self.max_gaps = max_gaps
+        self.received = 0
+        self.missing = 0
+        self.out_of_order = 0
+        self.gap_count = 0
+        self.longest_gap = 0
+        self.first_frame = None
+        self.last_frame = None
+        self.gaps = []
+        # Frames lost before each of the last window images, for the recent loss rate.
+        self._recent = collections.deque(maxlen=window)
+        self._recent_missing = 0
+
+    def observe(self, frame):
+        """Count an image, returns the number of frames lost right before it."""
+        if self.last_frame is not None and frame <= self.last_frame:
+            self.out_of_order += 1
+            return 0
+        lost = 0
+        if self.last_frame is not None and self.step:
+            lost = max(int(round((frame - self.last_frame) / float(self.step))) - 1, 0)
+        if lost:
+            self.missing += lost
+            self.gap_count += 1
+            self.longest_gap = max(self.longest_gap, lost)
+            if len(self.gaps) < self.max_gaps:
+                self.gaps.append([self.last_frame, frame, lost])
+        if len(self._recent) == self._recent.maxlen:
+            self._recent_missing -= self._recent[0]
+        self._recent.append(lost)
+        self._recent_missing += lost
+        if self.first_frame is None:
+            self.first_frame = frame
+        self.last_frame = frame
+        self.received += 1
+        return lost
+
+    @property
+    def loss_rate(self):
+        expected = self.received + self.missing
+        return self.missing / float(expected) if expected else 0.0
+
+    @property
+    def recent_loss_rate(self):
+        expected = len(self._recent) + self._recent_missing
+        return self._recent_missing / float(expected) if expected else 0.0
+
+    def stats(self):
+        return {
+            'step': self.step,
+            'received': self.received,
+            'missing': self.missing,
+            'gaps': self.gap_count,
+            'longest_gap': self.longest_gap,
+            'out_of_order': self.out_of_order,
+            'loss_rate': self.loss_rate,
+            'first_frame': self.first_frame,
+            'last_frame': self.last_frame}
+
+
+# ==============================================================================
+# -- FrameGaps -----------------------------------------------------------------
+# ==============================================================================
+
+
+class FrameGaps(object):
+    """Notices frames a sensor never delivered, from the frame ids it did.
+
+    Sensor callbacks observe(sensor, image.frame) from the client threads.
+    A sensor whose loss rate over its last window images goes above
+    threshold queues one warning, the tick loop pops them with warnings()
+    and shows them. The warning is rearmed once the rate is back under half
+    the threshold. report() writes the counts and every gap, as
+    [last frame received, next frame received, frames lost], to a JSON file.
+    """
+
+    def __init__(self, threshold=0.01, window=1000):
+        self.threshold = threshold
+        self.window = window
+        self.sensors = {}
+        # Counts of the actors a sensor had before it was respawned.
+        self._retired = collections.defaultdict(list)
+        self._warned = set()
+        self._warnings = collections.deque()
+        self._lock = threading.Lock()
+
+    def add_sensor(self, sensor, step=1):
+        """Start counting sensor, a newly spawned actor starts from scratch."""
+        with self._lock:
+            previous = self.sensors.get(sensor)
+            if previous is not None and previous.received:
+                self._retired[sensor].append(previous)
+            self.sensors[sensor] = SensorGaps(step, self.window)
+            self._warned.discard(sensor)
+
+    def observe(self, sensor, frame):
+        with self._lock:
+            gaps = self.sensors.get(sensor)
+            if gaps is None:
+                gaps = self.sensors[sensor] = SensorGaps(1, self.window)
+            if not gaps.observe(frame) and sensor not in self._warned:
+                return
+            rate = gaps.recent_loss_rate
+            if sensor in self._warned:
+                if rate < 0.5 * self.threshold:
+                    self._warned.discard(sensor)
+            elif self.threshold and rate > self.threshold:
+                self._warned.add(sensor)
+                self._warnings.append('%s lost %.1f%% of its recent frames (%d missing, last at frame %d)' % (
+                    sensor, 100.0 * rate, gaps.missing, frame - 1))
+
+    def warnings(self):
+        """Warnings raised since the last call."""
+        with self._lock:
+            warnings = list(self._warnings)
+            self._warnings.clear()
+        return warnings
+
+    def _history(self, sensor):
+        return self._retired[sensor] + [self.sensors[sensor]]
+
+    def stats(self):
+        """Totals per sensor over every actor it had."""
+        with self._lock:
+            stats = {}
+            for sensor in self.sensors:
+                history = self._history(sensor)
+                received = sum(gaps.received for gaps in history)
+                missing = sum(gaps.missing for gaps in history)
+                stats[sensor] = {
+                    'received': received,
+                    'missing': missing,
+                    'gaps': sum(gaps.gap_count for gaps in history),
+                    'longest_gap': max(gaps.longest_gap for gaps in history),
+                    'out_of_order': sum(gaps.out_of_order for gaps in history),
+                    'loss_rate': missing / float(received + missing) if received + missing else 0.0}
+            return stats
+
+    @property
+    def missing(self):
+        return sum(stats['missing'] for stats in self.stats().values())
+
+    def report(self, path):
+        stats = self.stats()
+        with self._lock:
+            report = {'threshold': self.threshold, 'window': self.window, 'sensors': {}}
+            for sensor in sorted(self.sensors):
+                history = self._history(sensor)
+                report['sensors'][sensor] = dict(
+                    stats[sensor],
+                    actors=[gaps.stats() for gaps in history],
+                    gap_list=[gap for gaps in history for gap in gaps.gaps])
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        return report
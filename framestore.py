@@ -0,0 +1,113 @@
+import glob
+import os
+import threading
+
+import numpy as np
+
+
+# ==============================================================================
+# -- FrameStore ----------------------------------------------------------------
+# ==============================================================================
+
+
+class FrameStore(object):
+    """Appends raw BGR frames of one camera into chunked .npy memmaps.
+
+    Each chunk is preallocated for chunk_frames frames, so an append is a
+    single copy into the mapped file. frames.bin lists the frame number held
+    by every slot, in write order, and a new chunk is started automatically
+    once the current one is full.
+    """
+
+    def __init__(self, root, height, width, channels=3, chunk_frames=500):
+        self.root = root
+        self.shape = (height, width, channels)
+        self.chunk_frames = chunk_frames
+        self._lock = threading.Lock()
+        self._chunk = None
+        if not os.path.isdir(root):
+            os.makedirs(root)
+        index_path = os.path.join(root, 'frames.bin')
+        self.count = os.path.getsize(index_path) // 8 if os.path.isfile(index_path) else 0
+        if self.count:
+            # Keep the chunk size of the existing store, mixing them would
+            # break the slot arithmetic in FrameStoreReader.
+            first = np.load(os.path.join(root, 'chunk-000000.npy'), mmap_mode='r')
+            if first.shape[1:] != self.shape:
+                raise ValueError('%s holds frames of shape %s' % (root, first.shape[1:]))
+            self.chunk_frames = first.shape[0]
+            del first
+        self._index = open(index_path, 'ab')
+
+    def append(self, frame, image):
+        """Copy one HxWx3 (or HxWx4, alpha is dropped) frame into the store."""
+        with self._lock:
+            chunk_id, slot = divmod(self.count, self.chunk_frames)
+            if slot == 0 or self._chunk is None:
+                self._open_chunk(chunk_id)
+            self._chunk[slot] = image[:, :, :self.shape[2]]
+            self._index.write(np.int64(frame).tobytes())
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._chunk is not None:
+                self._chunk.flush()
+                self._chunk = None
+            self._index.close()
+
+    def _open_chunk(self, chunk_id):
+        if self._chunk is not None:
+            self._chunk.flush()
+        self._index.flush()
+        path = os.path.join(self.root, 'chunk-%06d.npy' % chunk_id)
+        if os.path.isfile(path):
+            self._chunk = np.load(path, mmap_mode='r+')
+        else:
+            self._chunk = np.lib.format.open_memmap(
+                path, mode='w+', dtype=np.uint8, shape=(self.chunk_frames,) + self.shape)
+
+
+# ==============================================================================
+# -- FrameStoreReader ----------------------------------------------------------
+# ==============================================================================
+
+
+class FrameStoreReader(object):
+    """Zero-copy access to the frames of a FrameStore directory."""
+
+    def __init__(self, root):
+        self.root = root
+        self.frames = np.fromfile(os.path.join(root, 'frames.bin'), dtype=np.int64)
+        self._chunks = [
+            np.load(path, mmap_mode='r')
+            for path in sorted(glob.glob(os.path.join(root, 'chunk-*.npy')))]
+        self.chunk_frames = self._chunks[0].shape[0] if self._chunks else 1
+        self._position = {int(frame): n for n, frame in enumerate(self.frames)}
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, position):
+        chunk_id, slot = divmod(position, self.chunk_frames)
+        return self._chunks[chunk_id][slot]
+
+    def get(self, frame):
+        """The frame with the given frame number, as a read-only view."""
+        return self[self._position[frame]]
+
+    def slices(self, start, stop):
+        """Yield (frame numbers, frames) views covering positions [start, stop)."""
+        stop = min(stop, len(self))
+        while start < stop:
+            chunk_id, slot = divmod(start, self.chunk_frames)
+            n = min(stop - start, self.chunk_frames - slot)
+            yield self.frames[start:start + n], self._chunks[chunk_id][slot:slot + n]
+            start += n
+
+    def read(self, start, stop):
+        """Frames at positions [start, stop), only copied if it spans chunks."""
+        parts = [frames for _, frames in self.slices(start, stop)]
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.zeros(0, np.uint8)
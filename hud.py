@@ -0,0 +1,297 @@
+import pygame
+import collections
+import os
+import datetime 
+import math
+import time
+
+import numpy as np
+
+from utils import get_actor_display_name
+
+"""
+Welcome to CARLA manual control.
+
+Use ARROWS or WASD keys for control.
+
+    W            : throttle
+    S            : brake
+    A/D          : steer left/right
+    Q            : toggle reverse
+    Space        : hand-brake
+    P            : toggle autopilot
+    CTRL + W     : toggle constant velocity mode at 60 km/h
+
+    L            : toggle next light type
+    SHIFT + L    : toggle high beam
+
+    TAB          : change sensor position
+    ` or N       : next sensor
+    [1-8]        : change to sensor [1-8] 
+    C            : change weather (Shift+C reverse)
+    Backspace    : change vehicle
+
+    R            : toggle recording images to disk
+    CTRL + R     : toggle recording of simulation (replacing any previous)
+
+    F1           : toggle HUD
+    H/?          : toggle help
+    ESC          : quit
+"""
+
+# ==============================================================================
+# -- TextCache -----------------------------------------------------------------
+# ==============================================================================
+
+class TextCache(object):
+    """LRU cache of rendered text surfaces keyed by (text, color)."""
+    def __init__(self, font, max_size=256):
+        self.font = font
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = collections.OrderedDict()
+
+    def render(self, text, color=(255, 255, 255)):
+        key = (text, color)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = self.font.render(text, True, color)
+        if self.max_size > 0:
+            self._surfaces[key] = surface
+            if len(self._surfaces) > self.max_size:
+                self._surfaces.popitem(last=False)
+        return surface
+
+
+# ==============================================================================
+# -- FadingText ----------------------------------------------------------------
+# ==============================================================================
+
+class FadingText(object):
+    def __init__(self, font, dim, pos):
+        self.font = font
+        self.dim = dim
+        self.pos = pos
+        self.seconds_left = 0
+        self.surface = pygame.Surface(self.dim)
+
+    def set_text(self, text, color=(255, 255, 255), seconds=2.0):
+        text_texture = self.font.render(text, True, color)
+        self.seconds_left = seconds
+        self.surface.fill((0, 0, 0, 0))
+        self.surface.blit(text_texture, (10, 11))
+
+    def tick(self, _, clock):
+        delta_seconds = 1e-3 * clock.get_time()
+        self.seconds_left = max(0.0, self.seconds_left - delta_seconds)
+        self.surface.set_alpha(500.0 * self.seconds_left)
+
+    def render(self, display):
+        display.blit(self.surface, self.pos)
+
+
+# ==============================================================================
+# -- HelpText ------------------------------------------------------------------
+# ==============================================================================
+
+
+# class HelpText(object):
+#     """Helper class to handle text output using pygame"""
+#     def __init__(self, font, width, height):
+#         lines = __doc__.split('\n')
+#         self.font = font
+#         self.line_space = 18
+#         self.dim = (780, len(lines) * self.line_space + 12)
+#         self.pos = (0.5 * width - 0.5 * self.dim[0], 0.5 * height - 0.5 * self.dim[1])
+#         self.seconds_left = 0
+#         self.surface = pygame.Surface(self.dim)
+#         self.surface.fill((0, 0, 0, 0))
+#         for n, line in enumerate(lines):
+#             text_texture = self.font.render(line, True, (255, 255, 255))
+#             self.surface.blit(text_texture, (22, n * self.line_space))
+#             self._render = False
+#         self.surface.set_alpha(220)
+
+#     def toggle(self):
+#         self._render = not self._render
+
+#     def render(self, display):
+#         if self._render:
+#             display.blit(self.surface, self.pos)
+            
+            
+# ==============================================================================
+# -- HUD -----------------------------------------------------------------------
+# ==============================================================================
+
+
+class HUD(object):
+    def __init__(self, width, height, vehicle_refresh=0.5, nearby_vehicles=10, text_cache_size=256):
+        self.dim = (width, height)
+        font = pygame.font.Font(pygame.font.get_default_font(), 20)
+        font_name = 'courier' if os.name == 'nt' else 'mono'
+        fonts = [x for x in pygame.font.get_fonts() if font_name in x]
+        default_font = 'ubuntumono'
+        mono = default_font if default_font in fonts else fonts[0]
+        mono = pygame.font.match_font(mono)
+        self._font_mono = pygame.font.Font(mono, 12 if os.name == 'nt' else 14)
+        # Most info lines repeat from frame to frame, only rasterize the
+        # ones whose text changed. The panel background never changes.
+        self._text_cache = TextCache(self._font_mono, text_cache_size)
+        self._info_surface = pygame.Surface((220, height))
+        self._info_surface.set_alpha(100)
+        self._notifications = FadingText(font, (width, 40), (0, height - 40))
+        # self.help = HelpText(pygame.font.Font(mono, 16), width, height)
+        self.server_fps = 0
+        self.frame = 0
+        self.simulation_time = 0
+        self._show_info = True
+        self._info_text = []
+        self._server_clock = pygame.time.Clock()
+        # Nearby vehicles are listed from a cache of actor names and
+        # positions refreshed every vehicle_refresh seconds.
+        self.vehicle_refresh = vehicle_refresh
+        self.nearby_vehicles = nearby_vehicles
+        self._vehicles_updated = 0.0
+        self._vehicle_names = []
+        self._vehicle_positions = np.zeros((0, 3))
+        self._display_names = {}
+
+    def on_world_tick(self, timestamp):
+        self._server_clock.tick()
+        self.server_fps = self._server_clock.get_fps()
+        self.frame = timestamp.frame
+        self.simulation_time = timestamp.elapsed_seconds
+
+    def tick(self, world, clock):
+        self._notifications.tick(world, clock)
+        if not self._show_info:
+            return
+        t = world.player.get_transform()
+        v = world.player.get_velocity()
+        c = world.player.get_control()
+        metrics = world.data_recorder.metrics
+
+        if time.time() - self._vehicles_updated > self.vehicle_refresh:
+            self._update_vehicles(world)
+        self._info_text = [
+            'Server:  % 16.0f FPS' % self.server_fps,
+            'Client:  % 16.0f FPS' % clock.get_fps(),
+            'Preview: % 17.2f ms' % (1e3 * world.camera_manager.mean_convert_time),
+            'Encode p50/p99:% 6.1f/%5.1f ms' % tuple(1e3 * t for t in metrics.summary('encode')),
+            'Write  p50/p99:% 6.1f/%5.1f ms' % tuple(1e3 * t for t in metrics.summary('write')),
+            'Tick   p50/p99:% 6.1f/%5.1f ms' % tuple(1e3 * t for t in metrics.summary('world_tick')),
+            '',
+            'Vehicle: % 20s' % get_actor_display_name(world.player, truncate=20),
+            'Map:     % 20s' % world.map.name.split('/')[-1],
+            'Session: % 20s' % world.session.id[-20:],
+            'Simulation time: % 12s' % datetime.timedelta(seconds=int(self.simulation_time)),
+            '',
+            'Speed:   % 15.0f km/h' % (3.6 * math.sqrt(v.x**2 + v.y**2 + v.z**2)),
+            'Location:% 20s' % ('(% 5.1f, % 5.1f)' % (t.location.x, t.location.y)),
+            'GNSS:% 24s' % ('(% 2.6f, % 3.6f)' % (world.gnss_sensor.lat, world.gnss_sensor.lon)),
+            'Height:  % 18.0f m' % t.location.z,
+            '']
+
+        writer = world.data_recorder.writer
+        self._info_text += [
+            'Write queue: % 11d/%d' % (writer.queue_depth, writer.max_queue),
+            'Dropped: % 20d' % writer.dropped,
+            'Frames lost: % 16d' % world.data_recorder.gaps.missing,
+            'Incomplete: % 17d' % world.data_recorder.bundler.incomplete,
+            'Skipped: % 20d' % world.data_recorder.gate.skipped,
+            'Revisit count: % 14d' % world.data_recorder.revisit_count(t, self.frame),
+            '']
+        if world.coverage is not None:
+            self._info_text.insert(-1, 'Coverage: % 17.1f %%' % (100.0 * world.coverage.progress))
+
+        self._info_text += [
+            ('Throttle:', c.throttle, 0.0, 1.0),
+            ('Steer:', c.steer, -1.0, 1.0),
+            ('Brake:', c.brake, 0.0, 1.0),
+            ('Reverse:', c.reverse),
+            ('Hand brake:', c.hand_brake),
+            ('Manual:', c.manual_gear_shift),
+            'Gear:        %s' % {-1: 'R', 0: 'N'}.get(c.gear, c.gear)]
+
+        if len(self._vehicle_positions):
+            self._info_text += ['Nearby vehicles:']
+            location = np.array([t.location.x, t.location.y, t.location.z])
+            distances = np.linalg.norm(self._vehicle_positions - location, axis=1)
+            nearby = np.flatnonzero(distances <= 200.0)
+            if len(nearby) > self.nearby_vehicles:
+                nearby = nearby[np.argpartition(distances[nearby], self.nearby_vehicles)[:self.nearby_vehicles]]
+            for n in nearby[np.argsort(distances[nearby])]:
+                self._info_text.append('% 4dm %s' % (distances[n], self._vehicle_names[n]))
+
+    def _update_vehicles(self, world):
+        # One snapshot holds the transforms of every actor, reading them
+        # from it avoids a get_location() round trip per vehicle.
+        snapshot = world.world.get_snapshot()
+        names, positions, display_names = [], [], {}
+        for vehicle in world.world.get_actors().filter('vehicle.*'):
+            state = snapshot.find(vehicle.id)
+            if vehicle.id == world.player.id or state is None:
+                continue
+            name = self._display_names.get(vehicle.id)
+            if name is None:
+                name = get_actor_display_name(vehicle, truncate=22)
+            display_names[vehicle.id] = name
+            l = state.get_transform().location
+            names.append(name)
+            positions.append((l.x, l.y, l.z))
+        self._display_names = display_names
+        self._vehicle_names = names
+        self._vehicle_positions = np.array(positions, dtype=np.float64).reshape(-1, 3)
+        self._vehicles_updated = time.time()
+
+
+    def toggle_info(self):
+        self._show_info = not self._show_info
+
+    def notification(self, text, seconds=2.0):
+        self._notifications.set_text(text, seconds=seconds)
+
+    def error(self, text):
+        self._notifications.set_text('Error: %s' % text, (255, 0, 0))
+
+    def render(self, display):
+        if self._show_info:
+            display.blit(self._info_surface, (0, 0))
+            v_offset = 4
+            bar_h_offset = 100
+            bar_width = 106
+            for item in self._info_text:
+                if v_offset + 18 > self.dim[1]:
+                    break
+                if isinstance(item, list):
+                    if len(item) > 1:
+                        points = [(x + 8, v_offset + 8 + (1.0 - y) * 30) for x, y in enumerate(item)]
+                        pygame.draw.lines(display, (255, 136, 0), False, points, 2)
+                    item = None
+                    v_offset += 18
+                elif isinstance(item, tuple):
+                    if isinstance(item[1], bool):
+                        rect = pygame.Rect((bar_h_offset, v_offset + 8), (6, 6))
+                        pygame.draw.rect(display, (255, 255, 255), rect, 0 if item[1] else 1)
+                    else:
+                        rect_border = pygame.Rect((bar_h_offset, v_offset + 8), (bar_width, 6))
+                        pygame.draw.rect(display, (255, 255, 255), rect_border, 1)
+                        f = (item[1] - item[2]) / (item[3] - item[2])
+                        if item[2] < 0.0:
+                            rect = pygame.Rect((bar_h_offset + f * (bar_width - 6), v_offset + 8), (6, 6))
+                        else:
+                            rect = pygame.Rect((bar_h_offset, v_offset + 8), (f * bar_width, 6))
+                        pygame.draw.rect(display, (255, 255, 255), rect)
+                    item = item[0]
+                if item:  # At this point has to be a str.
+                    surface = self._text_cache.render(item)
+                    display.blit(surface, (8, v_offset))
+                v_offset += 18
+        self._notifications.render(display)
+        # self.help.render(display)
\ No newline at end of file
@@ -99,7 +99,10 @@ class KeyboardControl(object):
                     world.camera_manager.set_sensor(event.key - 1 - K_0 + index_ctrl)
                     
                 elif event.key == K_r and not (pygame.key.get_mods() & KMOD_CTRL):
-                    world.recording = not world.recording
+                    if world.recording:
+                        world.recording = False
+                    else:
+                        world.start_recording()
                     # print('Recording %s' % ('On' if recording else 'Off'))
                     world.hud.notification('Recording %s' % ('On' if world.recording else 'Off'))
 
@@ -0,0 +1,97 @@
+import collections
+import threading
+import time
+
+from bundler import SensorSchedule
+
+
+# ==============================================================================
+# -- Lockstep ------------------------------------------------------------------
+# ==============================================================================
+
+
+class Lockstep(object):
+    """Per-frame queues of sensor data for lockstep synchronous capture.
+
+    Sensor callbacks deliver(sensor, data) from the client threads, the tick
+    loop collect(frame)s a frame once it has been simulated: it waits until
+    every sensor due on that frame (see SensorSchedule) delivered its data,
+    or timeout seconds. Data of a frame that was already collected is
+    counted late and dropped, due sensors without data at the deadline are
+    counted missing.
+    """
+
+    def __init__(self, sensors, timeout=1.0, schedule=None):
+        self.sensors = list(sensors)
+        self.schedule = schedule if schedule is not None else SensorSchedule(sensors)
+        self.timeout = timeout
+        self.collected = 0
+        self.complete = 0
+        self.late = collections.Counter()
+        self.missing = collections.Counter()
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self._frames = {}
+        self._last_frame = None
+        self._cond = threading.Condition()
+
+    def deliver(self, sensor, data):
+        with self._cond:
+            if self._last_frame is not None and data.frame <= self._last_frame:
+                self.late[sensor] += 1
+                return
+            self.schedule.seen(sensor, data.frame)
+            delivered = self._frames.setdefault(data.frame, {})
+            delivered[sensor] = data
+            if self.schedule.ready(data.frame, delivered):
+                self._cond.notify_all()
+
+    def collect(self, frame, timeout=None):
+        """Wait for the data of frame, returns (data by sensor, complete)."""
+        deadline = time.time() + (self.timeout if timeout is None else timeout)
+        start = time.time()
+        with self._cond:
+            while not self.schedule.ready(frame, self._frames.get(frame, ())):
+                remaining = deadline - time.time()
+                if remaining <= 0.0:
+                    break
+                self._cond.wait(remaining)
+            data = self._frames.pop(frame, {})
+            # Older frames can not be collected any more.
+            for stale in [f for f in self._frames if f < frame]:
+                for sensor in self._frames.pop(stale):
+                    self.late[sensor] += 1
+            self._last_frame = frame
+            waited = time.time() - start
+            self.wait_time += waited
+            self.max_wait = max(self.max_wait, waited)
+            self.collected += 1
+            due = self.schedule.due(frame)
+            complete = all(sensor in data for sensor in due)
+            if complete:
+                self.complete += 1
+            else:
+                for sensor in due:
+                    if sensor not in data:
+                        self.missing[sensor] += 1
+        return data, complete
+
+    def discard(self, frame):
+        """Forget frame and older ones without collecting them."""
+        with self._cond:
+            for old in [f for f in self._frames if f <= frame]:
+                del self._frames[old]
+            self._last_frame = frame if self._last_frame is None else max(self._last_frame, frame)
+
+    @property
+    def mean_wait(self):
+        return self.wait_time / self.collected if self.collected else 0.0
+
+    def stats(self):
+        return {
+            'collected': self.collected,
+            'complete': self.complete,
+            'late': dict(self.late),
+            'missing': dict(self.missing),
+            'mean_wait': self.mean_wait,
+            'max_wait': self.max_wait}
@@ -26,7 +26,7 @@ Use ARROWS or WASD keys for control.
     ` or N       : next sensor
     [1-8]        : change to sensor [1-8] 
     C            : change weather (Shift+C reverse)
-    Backspace    : change vehicle
+    Backspace    : reset vehicle
 
     R            : toggle recording images to disk
     CTRL + R     : toggle recording of simulation (replacing any previous)
@@ -59,15 +59,17 @@ except IndexError:
 # -- imports -------------------------------------------------------------------
 # ==============================================================================
 
-import cv2
 import carla
-import pygame
 
 from carla import ColorConverter as cc
 
 import argparse 
+import collections
+import json
 import logging
-import pandas as pd
+import random
+import threading
+import time
 
 
 try:
@@ -76,10 +78,24 @@ except ImportError:
     raise RuntimeError('cannot import numpy, make sure numpy package is installed')
 
 
-from utils import find_weather_presets, get_actor_display_name, HUD, FadingText
-from keyboardcontrol import KeyboardControl
-from camera import CameraManager
+from utils import find_weather_presets, get_actor_display_name
 from sensors import GnssSensor
+from writer import AsyncWriter
+from poselog import PoseLog, POSE_DTYPE
+from shards import ShardWriter
+from framestore import FrameStore
+from bundler import FrameBundler, SensorSchedule
+from capture_gate import CaptureGate
+from pose_index import PoseIndex
+from route import Route, RouteRecorder
+from encoders import ENCODERS, make_encoder
+from lockstep import Lockstep
+from metrics import Metrics
+from frame_gaps import FrameGaps
+from coverage import CoverageTracker, WaypointFollower, plan_coverage
+from sessions import Session, latest_session, new_session_id, run_complete
+from rig import default_rig, load_rig, mount_inverse, sensor_blueprint, sensor_transform, spawn_rig, vehicle_transform
+from dynamic_weather import WeatherTimeline, WEATHER_FIELDS, weather_values
 
 
 global loc, recording
@@ -93,51 +109,235 @@ loc = None
 # =============================================================================
 
 class DataRecorder():
-    def __init__(self, data_dir, cam_res_x, cam_res_y):
+    def __init__(self, data_dir, cam_res_x, cam_res_y, writer_threads=2, max_queue=64, backpressure='block',
+                 output_format='files', shard_size=512, chunk_frames=500, cameras=('cam1',), bundle_timeout=0.5,
+                 min_distance=0.0, min_yaw=0.0, revisit_radius=10.0, revisit_gap=600, weather_fields=(),
+                 encoder='jpeg', quality=None, png_level=None, metrics_interval=10.0, gap_threshold=0.01,
+                 mounts=None):
         self.data_dir = data_dir
         self.cam_res_width, self.cam_res_height = cam_res_x, cam_res_y
+        self.output_format = output_format
+        self.encoder_name = encoder
+        self.encoder = make_encoder(encoder, quality, png_level)
+        # Resolution of every camera seen so far, kept in recorder.json.
+        self.resolutions = {}
+        self._metadata_lock = threading.Lock()
+        self.writer = AsyncWriter(writer_threads, max_queue, backpressure)
+        # Cameras with a sensor_tick are only waited for on the frames they are due.
+        self.schedule = SensorSchedule(cameras)
+        self.bundler = FrameBundler(cameras, self.add_bundle, timeout=bundle_timeout, schedule=self.schedule)
+        self.gate = CaptureGate(min_distance, min_yaw)
+        # Saved poses, for "have we been here before" queries while driving.
+        self.pose_index = PoseIndex(cell_size=max(revisit_radius, 1.0))
+        self.revisit_radius = revisit_radius
+        self.revisit_gap = revisit_gap
+        # Subtracted from simulator frame numbers to get the frame ids of
+        # the session. Images older than first_frame are late ones from
+        # before the start.
+        self.frame_offset = 0
+        self.first_frame = 0
+        # Optional callable(frame) -> frame id, used instead of frame_offset
+        # when the ids are not contiguous, e.g. those of a recorded route.
+        self.frame_ids = None
+        # Frame ids already in the session, not written again.
+        self.saved_frames = frozenset()
+        # Optional callable(frame) -> transform, used instead of the pose of
+        # the frame's images when the pose of every frame is known upfront.
+        self.pose_source = None
+        # Inverse mount matrix by camera: the vehicle pose of a frame is
+        # worked out from the transform its images were taken at.
+        self.mounts = mounts or {}
+        # Session journal every saved frame id is written to, if any.
+        self.session = None
+        # Recent (first frame, values) weather changes, stamped into the
+        # metadata of every frame when weather_fields is set.
+        self.weather_fields = tuple(weather_fields)
+        self._weather = collections.deque(maxlen=64)
+        self._weather_lock = threading.Lock()
         if not os.path.isdir(data_dir):
             os.makedirs(data_dir)
-        if not os.path.isfile(os.path.join(self.data_dir,"data.csv")):
-            pd.DataFrame(None, columns=["Frame","x","y", "yaw"],).to_csv(f"{self.data_dir}/data.csv")
-            print("No previous data found, creating new file")
-        if not os.path.isdir(str(data_dir)+"/cam1"):
-            os.makedirs(str(data_dir)+"/cam1")
-        if not os.path.isdir(str(data_dir)+"/cam2"):
-            os.makedirs(str(data_dir)+"/cam2")
-        if not os.path.isdir(str(data_dir)+"/cam3"):
-            os.makedirs(str(data_dir)+"/cam3")
+        # Stage latencies of the capture path, exported to the data directory.
+        self.metrics = Metrics(data_dir, metrics_interval)
+        # Frames the sensors never delivered, reported in gaps.json.
+        self.gaps = FrameGaps(gap_threshold)
+        pose_dtype = POSE_DTYPE
+        if self.weather_fields:
+            pose_dtype = np.dtype(POSE_DTYPE.descr + [(name, '<f4') for name in self.weather_fields])
+        self.pose_log = PoseLog(os.path.join(self.data_dir, "poses.bin"), pose_dtype)
+        self.shards = None
+        self.frame_stores = None
+        self.chunk_frames = chunk_frames
+        if output_format == 'shards':
+            self.shards = ShardWriter(os.path.join(self.data_dir, "shards"), max_bytes=shard_size * 1024 * 1024)
+        elif output_format == 'raw':
+            self.frame_stores = {}
+            self._frame_stores_lock = threading.Lock()
+        else:
+            for sub_dir in cameras:
+                if not os.path.isdir(str(data_dir)+"/"+sub_dir):
+                    os.makedirs(str(data_dir)+"/"+sub_dir)
     
     def data_processing(self, image, sub_dir, recording):
-        i = np.asarray(image.raw_data)
-        depth_rgb = i.reshape((self.cam_res_height, self.cam_res_width, 4))
-        img = depth_rgb[:, :, :3]
-        # print(loc)
-        #w, h, c = i3.shape
-        if recording:
-            frame_name = "f{:08d}".format(image.frame)
-            
-            cv2.imwrite(str(self.data_dir)+"/"+str(sub_dir)+"/"+frame_name+".jpg", img)
-    
-            data = {
-                    'Frame': [str(frame_name)],
-                    'x': [str(loc.location.x)],
-                    'y': [str(loc.location.y)],
-                    'yaw': [str(loc.rotation.yaw)]
-                }
-            df = pd.DataFrame(data)
-            df.to_csv(f"{self.data_dir}/data.csv", mode='a', index=False, header=False)
-        
-    def img_processing(self, image, sub_dir, recording):
-        i = np.asarray(image.raw_data)
-        depth_rgb = i.reshape((self.cam_res_height, self.cam_res_width, 4))
-        img = depth_rgb[:, :, :3]
-        # print(loc)
-        #w, h, c = i3.shape
-        if recording:
-            frame_name = "f{:08d}".format(image.frame)
-            
-            cv2.imwrite(str(self.data_dir)+"/"+str(sub_dir)+"/"+frame_name+".jpg", img)
+        # Runs on the sensor thread: collect the rig images of this frame,
+        # the bundle is written once every camera has delivered.
+        if recording and image.frame >= self.first_frame:
+            self.bundler.add(sub_dir, image)
+
+    def add_bundle(self, frame, images, complete=True, pose=None):
+        # One pose and one write job per frame for the whole rig, leave the
+        # encoding and disk work to the writer threads. Frames taken too
+        # close to the last saved one are not even queued.
+        frame_id = self.frame_id(frame)
+        if frame_id in self.saved_frames:
+            return
+        with self.metrics.timer('pose'):
+            if pose is None:
+                pose = self.pose_source(frame) if self.pose_source is not None else self._image_pose(images)
+            accepted = self.gate.accept(pose, len(images))
+        if accepted:
+            weather = self._weather_at(frame) if self.weather_fields else None
+            self.writer.submit(self._write_bundle, frame_id, images, pose, weather)
+
+    def frame_id(self, frame):
+        """Frame id a simulator frame is saved under."""
+        if self.frame_ids is not None:
+            return self.frame_ids(frame)
+        return frame - self.frame_offset
+
+    def _image_pose(self, images):
+        # The last client tick can be a frame behind the images.
+        for sub_dir, image in images.items():
+            if sub_dir in self.mounts:
+                return vehicle_transform(image.transform, self.mounts[sub_dir])
+        return loc
+
+    def set_weather(self, frame, values):
+        """Weather values, in weather_fields order, in effect from frame on."""
+        with self._weather_lock:
+            self._weather.append((frame, tuple(values)))
+
+    def _weather_at(self, frame):
+        with self._weather_lock:
+            for first_frame, values in reversed(self._weather):
+                if first_frame <= frame:
+                    return values
+        return (float('nan'),) * len(self.weather_fields)
+
+    def _write_bundle(self, frame, images, pose, weather=None):
+        for sub_dir, image in images.items():
+            self._write_frame(frame, image, sub_dir, pose, weather)
+        image = next(iter(images.values()))
+        if pose is not None:
+            with self.metrics.timer('pose_log'):
+                self.pose_log.append((
+                    frame, image.timestamp,
+                    pose.location.x, pose.location.y, pose.location.z, pose.rotation.yaw) + (weather or ()))
+            self.pose_index.add(frame, pose.location.x, pose.location.y, pose.rotation.yaw)
+        # Journaled by the writer thread once written: frames dropped by the
+        # backpressure policy or failed never show up in the manifest.
+        if self.session is not None:
+            self.session.frame(frame, image.frame, image.timestamp)
+
+    def revisit_count(self, pose, frame):
+        """Saved frames near pose that were taken at least revisit_gap frames before simulator frame."""
+        return self.pose_index.revisits(
+            pose.location.x, pose.location.y, self.revisit_radius, self.frame_id(frame), self.revisit_gap)
+
+    def _write_frame(self, frame, image, sub_dir, pose, weather=None):
+        with self.metrics.timer('convert'):
+            i = np.frombuffer(image.raw_data, dtype=np.uint8)
+            # Sensors of a rig can have their own resolution.
+            depth_rgb = i.reshape((image.height, image.width, 4))
+        frame_name = "f{:08d}".format(frame)
+        if sub_dir not in self.resolutions:
+            self._add_camera(sub_dir, image.width, image.height)
+
+        if self.frame_stores is not None:
+            with self.metrics.timer('write'):
+                self._frame_store(sub_dir, image.height, image.width).append(frame, depth_rgb)
+        elif self.shards is not None:
+            with self.metrics.timer('encode'):
+                data = self.encoder.encode(depth_rgb)
+            meta = {
+                'frame': frame,
+                'camera': sub_dir,
+                'timestamp': image.timestamp,
+                'width': image.width,
+                'height': image.height}
+            if pose is not None:
+                meta.update(
+                    x=pose.location.x, y=pose.location.y, z=pose.location.z, yaw=pose.rotation.yaw)
+            if weather is not None:
+                meta.update(zip(self.weather_fields, weather))
+            with self.metrics.timer('write'):
+                self.shards.write(frame_name + "_" + sub_dir, {
+                    self.encoder.ext: data,
+                    'json': json.dumps(meta).encode('utf-8')})
+        else:
+            with self.metrics.timer('encode'):
+                data = self.encoder.encode(depth_rgb)
+            with self.metrics.timer('write'):
+                with open(str(self.data_dir)+"/"+str(sub_dir)+"/"+frame_name+"."+self.encoder.ext, 'wb') as f:
+                    f.write(data)
+
+    def _add_camera(self, sub_dir, width, height):
+        # Readers need the size of every camera to decode raw frames.
+        with self._metadata_lock:
+            self.resolutions[sub_dir] = [width, height]
+            metadata = {
+                'output_format': self.output_format,
+                'encoder': self.encoder_name,
+                'ext': self.encoder.ext,
+                'quality': getattr(self.encoder, 'quality', None),
+                'png_level': getattr(self.encoder, 'level', None),
+                'cameras': self.resolutions}
+            with open(os.path.join(self.data_dir, 'recorder.json'), 'w') as f:
+                json.dump(metadata, f, indent=2)
+
+    def _frame_store(self, sub_dir, height, width):
+        with self._frame_stores_lock:
+            if sub_dir not in self.frame_stores:
+                self.frame_stores[sub_dir] = FrameStore(
+                    os.path.join(self.data_dir, "raw", sub_dir),
+                    height, width, chunk_frames=self.chunk_frames)
+            return self.frame_stores[sub_dir]
+
+    def close(self):
+        """Drain every accepted frame to disk and stop the writer threads."""
+        self.bundler.flush()
+        self.writer.close()
+        self.pose_log.close()
+        if self.metrics.interval:
+            self.metrics.export()
+        self.gaps.report(os.path.join(self.data_dir, 'gaps.json'))
+        if self.shards is not None:
+            self.shards.close()
+        if self.frame_stores is not None:
+            for store in self.frame_stores.values():
+                store.close()
+        stats = self.writer.stats()
+        print('DataRecorder: wrote %d frames, dropped %d, failed %d' % (
+            stats['written'], stats['dropped'], stats['failed']))
+        if self.gate.skipped:
+            print('DataRecorder: skipped %d frames (%d images) too close to the last saved one' % (
+                self.gate.skipped, self.gate.skipped_images))
+        if self.bundler.incomplete:
+            print('DataRecorder: %d incomplete bundles, missing %s' % (
+                self.bundler.incomplete, dict(self.bundler.missing)))
+        lost = dict((sensor, stats['missing']) for sensor, stats in self.gaps.stats().items() if stats['missing'])
+        if lost:
+            print('DataRecorder: sensors lost frames %s, see gaps.json' % lost)
+        if self.session is not None:
+            self.session.close(self.stats())
+
+    def stats(self):
+        stats = self.writer.stats()
+        stats.update(
+            poses=self.pose_log.count,
+            incomplete=self.bundler.incomplete,
+            skipped=self.gate.skipped,
+            lost=self.gaps.missing)
+        return stats
             
 
 # ==============================================================================
@@ -146,11 +346,18 @@ class DataRecorder():
 
 
 class World(object):
-    def __init__(self, carla_world,hud, args):
+    def __init__(self, carla_world,hud, args, client=None):
         self.world = carla_world
+        self.client = client
         self.sync = args.sync
         self.actor_role_name = args.rolename
         self.cam_res_x, self.cam_res_y = args.cam_res_x, args.cam_res_y
+        if args.rig:
+            self.rig = load_rig(args.rig, self.cam_res_x, self.cam_res_y)
+        else:
+            self.rig = default_rig(args.num_cams, self.cam_res_x, self.cam_res_y)
+        self.num_cams = len(self.rig)
+        self.cameras = []
         try:
             self.map = self.world.get_map()
         except RuntimeError as error:
@@ -161,19 +368,207 @@ class World(object):
         self.hud = hud
         self.player = None
         self.recording = False
+        # First simulator frame of the current recording, see start_recording().
+        self._record_from = 0
         self.gnss_sensor = None
         self.camera_manager = None
         self._weather_presets = find_weather_presets()
         self._weather_index = 0
         self._gamma = args.gamma
-        self.data_recorder = DataRecorder("data", self.cam_res_x, self.cam_res_y)
-        self.restart()
-        self.world.on_tick(hud.on_world_tick)
+        # Bad arguments fail here, before anything is spawned or written.
+        if args.weather:
+            self._weather_preset(args.weather)
+        # Every run gets its own session directory under --output-dir.
+        self.session = Session(args.output_dir, args.session, resume=args.resume)
+        self._session_started = False
+        self.data_recorder = DataRecorder(
+            self.session.path, self.cam_res_x, self.cam_res_y,
+            writer_threads=args.writer_threads,
+            max_queue=args.writer_queue,
+            backpressure=args.backpressure,
+            output_format=args.output_format,
+            shard_size=args.shard_size,
+            chunk_frames=args.chunk_frames,
+            cameras=[sensor['sub_dir'] for sensor in self.rig],
+            bundle_timeout=args.bundle_timeout,
+            min_distance=args.min_distance,
+            min_yaw=args.min_yaw,
+            revisit_radius=args.revisit_radius,
+            weather_fields=WEATHER_FIELDS if args.dynamic_weather else (),
+            encoder=args.encoder,
+            quality=args.quality,
+            png_level=args.png_level,
+            metrics_interval=args.metrics_interval,
+            gap_threshold=args.gap_threshold,
+            mounts=dict((sensor['sub_dir'], mount_inverse(sensor)) for sensor in self.rig))
+        self.data_recorder.session = self.session
+        self.dynamic_weather = None
+        self.weather_every = args.weather_every
+        self.weather_speed = args.weather_speed
+        # Length of the precomputed weather table, later times are computed on demand.
+        self._weather_duration = args.duration or 3600.0
+        # Lockstep: the tick loop collects the rig images of every frame
+        # itself, pipeline_depth - 1 ticks behind the simulation.
+        self.lockstep = None
+        self.pipeline_depth = args.pipeline_depth
+        self._ticked = collections.deque()
+        # Coverage tour, see start_coverage().
+        self.coverage = None
+        self.coverage_plan = None
+        self.follower = None
+        self.travelled = 0.0
+        self._last_location = None
+        if args.lockstep:
+            self.lockstep = Lockstep(
+                [sensor['sub_dir'] for sensor in self.rig], timeout=args.lockstep_timeout,
+                schedule=self.data_recorder.schedule)
+        self.route_recorder = None
+        if args.record_route:
+            self.route_recorder = RouteRecorder(
+                args.record_route, self.map.name.split('/')[-1],
+                self.world.get_settings().fixed_delta_seconds or 0.0)
+        try:
+            self.restart()
+            # A coordinator worker runs job after job in one process, never
+            # stamp a frame with the last pose of the previous World.
+            global loc
+            loc = self.player.get_transform()
+            if args.weather:
+                self.set_weather(args.weather)
+            if args.dynamic_weather:
+                self._start_dynamic_weather(self.world.get_weather(), seed=args.seed)
+            self._start_session(args)
+            if hud is not None:
+                self.world.on_tick(hud.on_world_tick)
+        except BaseException:
+            # Nobody gets a World to destroy: do not leave the car, its
+            # sensors or the session behind for the next run on this server.
+            self.destroy()
+            raise
         print("spawned")
         self.constant_velocity_enabled = False
-
+        self.restart_latency = None
+
+
+    def _start_session(self, args):
+        # Frame ids are local to the session: the first frame of this run
+        # gets the next free id, whatever the simulator's frame counter says.
+        first_frame = self._rebase_frames()
+        settings = self.world.get_settings()
+        self.session.start_run(
+            map=self.map.name,
+            weather=self._weather_presets[self._weather_index][1] if args.weather else None,
+            weather_values=weather_values(self.world.get_weather()),
+            dynamic_weather=bool(args.dynamic_weather),
+            sensors=self.rig,
+            synchronous_mode=settings.synchronous_mode,
+            fixed_delta_seconds=settings.fixed_delta_seconds,
+            output_format=args.output_format,
+            encoder=args.encoder,
+            sim_frame=first_frame,
+            args=vars(args))
+        self._session_started = True
+        print('Session %s: %s, run %d from frame %d' % (
+            self.session.id, self.session.path, self.session.run, self.session.next_frame))
+
+    def _rebase_frames(self):
+        # The next simulator frame gets the next free frame id of the session.
+        first_frame = self.world.get_snapshot().frame + 1
+        self.data_recorder.first_frame = first_frame
+        self.data_recorder.frame_offset = first_frame - self.session.next_frame
+        return first_frame
+
+    def start_recording(self, rebase=False):
+        """Record from the next frame on.
+
+        With rebase that frame gets the next free frame id of the session,
+        for a run that has not recorded anything yet.
+        """
+        if rebase:
+            self._rebase_frames()
+        # Images of the frame already simulated may be half delivered.
+        self._record_from = self.world.get_snapshot().frame + 1
+        self.recording = True
+
+    def start_coverage(self, driver='tm', tm_port=8000, target_speed=30.0):
+        """Drive a tour over every lane of the town instead of wandering."""
+        start = time.time()
+        plan = self.coverage_plan = plan_coverage(self.map, self.player.get_location())
+        self.coverage = CoverageTracker(plan.required)
+        if not plan.tour:
+            # coverage_done right away, the run ends without driving.
+            print('Coverage: nothing to cover, none of the %d lanes can be driven there and back' % (
+                len(plan.unreachable)))
+            return
+        waypoints = plan.waypoints()
+        # Start on the tour, no sim time is spent getting there.
+        transform = waypoints[0].transform
+        self.player.set_transform(carla.Transform(
+            carla.Location(transform.location.x, transform.location.y, transform.location.z + 0.5),
+            transform.rotation))
+        traffic_manager = self.client.get_trafficmanager(tm_port) if self.client is not None else None
+        if driver == 'tm' and hasattr(traffic_manager, 'set_path'):
+            self.player.set_autopilot(True, tm_port)
+            traffic_manager.auto_lane_change(self.player, False)
+            traffic_manager.set_path(self.player, plan.locations())
+        else:
+            self.player.set_autopilot(False)
+            self.follower = WaypointFollower(self.player, waypoints, target_speed)
+        print('Coverage: %d lanes, %.1f km, tour of %.1f km (x%.2f) driven by %s, %d lanes unreachable, planned in %.2f s' % (
+            len(plan.required), plan.required_length / 1000.0, plan.length / 1000.0, plan.overhead,
+            'waypoint follower' if self.follower is not None else 'Traffic Manager',
+            len(plan.unreachable), time.time() - start))
+
+    @property
+    def coverage_done(self):
+        if self.coverage is None:
+            return False
+        # The Traffic Manager drives on at the end of its path, stop once
+        # the tour's length is behind us even if a few bins were missed.
+        return self.coverage.progress >= 1.0 or \
+            (self.follower is not None and self.follower.done) or \
+            self.travelled >= 1.1 * self.coverage_plan.length
+
+    def _tick_coverage(self, transform):
+        location = transform.location
+        if self._last_location is not None:
+            self.travelled += location.distance(self._last_location)
+        self._last_location = location
+        self.coverage.update(self.map.get_waypoint(location))
+        if self.follower is not None and not self.follower.done:
+            self.player.apply_control(self.follower.run_step())
 
     def restart(self):
+        start = time.time()
+        restarting = self.player is not None
+        if restarting and self.player.is_alive:
+            # Keep the car and its sensors, only put it back on its wheels:
+            # no actor round trips and the recorder keeps its frames.
+            # The main loop's next tick applies it, so the frame goes
+            # through the same lockstep and route bookkeeping as any other.
+            self.reset_player()
+        else:
+            self._spawn()
+        if not restarting:
+            if self.sync:
+                self.world.tick()
+            else:
+                self.world.wait_for_tick()
+        else:
+            self.restart_latency = time.time() - start
+            if self.hud is not None:
+                self.hud.notification('Restarted in %.0f ms' % (1000.0 * self.restart_latency))
+
+    def reset_player(self):
+        transform = self.player.get_transform()
+        transform.location.z += 2.0
+        transform.rotation.roll = 0.0
+        transform.rotation.pitch = 0.0
+        self.player.set_transform(transform)
+        self.player.set_target_velocity(carla.Vector3D())
+        self.player.apply_control(carla.VehicleControl())
+
+    def _spawn(self):
         self.player_max_speed = 1.589
         self.player_max_speed_fast = 3.713
         # Keep same camera config if the camera manager exists.
@@ -207,46 +602,52 @@ class World(object):
             spawn_point.location.z += 2.0
             spawn_point.rotation.roll = 0.0
             spawn_point.rotation.pitch = 0.0
-            self.destroy()
+            self.destroy(close_recorder=False)
             self.player = self.world.try_spawn_actor(blueprint, spawn_point)
             self.modify_vehicle_physics(self.player)
-        while self.player is None:
-            if not self.map.get_spawn_points():
+        if self.player is None:
+            spawn_points = self.map.get_spawn_points()
+            if not spawn_points:
                 print('There are no spawn points available in your map/town.')
                 print('Please add some Vehicle Spawn Point to your UE4 scene.')
                 sys.exit(1)
-            spawn_points = self.map.get_spawn_points()
-            spawn_point = spawn_points[10] if spawn_points else carla.Transform()
-            self.player = self.world.try_spawn_actor(blueprint, spawn_point)
+            # spawn_points[10], or the next free one when it is taken, e.g.
+            # by a car another client left there.
+            for spawn_point in spawn_points[10:] + spawn_points[:10]:
+                self.player = self.world.try_spawn_actor(blueprint, spawn_point)
+                if self.player is not None:
+                    break
+            if self.player is None:
+                raise RuntimeError('could not spawn the player, all %d spawn points are taken' % len(spawn_points))
             self.modify_vehicle_physics(self.player)
         # Set up the sensors.
         self.gnss_sensor = GnssSensor(self.player)
-        self.camera_manager = CameraManager(self.player, self.hud, self._gamma)
-        self.camera_manager.transform_index = cam_pos_index
-        self.camera_manager.set_sensor(cam_index, notify=False)
-        
-        camera_bp = bp_lib.find('sensor.camera.rgb')
-
-        camera_bp.set_attribute('image_size_x', str(self.cam_res_x))
-        camera_bp.set_attribute('image_size_y', str(self.cam_res_y)) 
-        camera_bp.set_attribute('fov', '120') 
-
-        camera_init_trans1 = carla.Transform(carla.Location(x=0.5,z=3.4), carla.Rotation(yaw=0))  
-        camera_init_trans2 = carla.Transform(carla.Location(x=0.5,z=3.4), carla.Rotation(yaw=120)) 
-        camera_init_trans3 = carla.Transform(carla.Location(x=0.5,z=3.4), carla.Rotation(yaw=240)) 
+        if self.hud is not None:
+            # The spectator camera only feeds the pygame window, headless
+            # runs never spawn it (nor import pygame through camera.py).
+            from camera import CameraManager
+            self.camera_manager = CameraManager(self.player, self.hud, self._gamma)
+            self.camera_manager.transform_index = cam_pos_index
+            self.camera_manager.set_sensor(cam_index, notify=False)
         
-        self.camera1 = self.world.spawn_actor(camera_bp, camera_init_trans1, attach_to=self.player) 
-        # self.camera2 = self.world.spawn_actor(camera_bp, camera_init_trans2, attach_to=self.player) 
-        # self.camera3 = self.world.spawn_actor(camera_bp, camera_init_trans3, attach_to=self.player) 
-
-        self.camera1.listen(lambda image1: self.data_recorder.data_processing(image1, "cam1", self.recording)) 
-        # self.camera2.listen(lambda image2: self.data_recorder.img_processing(image2, "cam2", self.recording)) 
-        # self.camera3.listen(lambda image3: self.data_recorder.img_processing(image3, "cam3", self.recording)) 
-
-        if self.sync:
-            self.world.tick()
+        # The rig: one batch round trip for all the cameras when we have a client.
+        if self.client is not None:
+            self.cameras = spawn_rig(self.client, self.world, self.rig, self.player)
         else:
-            self.world.wait_for_tick()
+            self.cameras = [
+                self.world.spawn_actor(sensor_blueprint(bp_lib, sensor), sensor_transform(sensor), attach_to=self.player)
+                for sensor in self.rig]
+        # Simulator frames between two images of a sensor, to tell lost frames
+        # from ones it was not due to capture.
+        delta = self.world.get_settings().fixed_delta_seconds
+        for sensor in self.rig:
+            step = 1
+            if sensor['sensor_tick'] > 0.0:
+                step = max(int(round(sensor['sensor_tick'] / delta)), 1) if delta else None
+            self.data_recorder.gaps.add_sensor(sensor['sub_dir'], step)
+            self.data_recorder.schedule.set_step(sensor['sub_dir'], step)
+        for sensor, camera in zip(self.rig, self.cameras):
+            camera.listen(lambda image, sub_dir=sensor['sub_dir']: self._on_image(image, sub_dir))
 
     def next_weather(self, reverse=False):
         self._weather_index += -1 if reverse else 1
@@ -254,6 +655,51 @@ class World(object):
         preset = self._weather_presets[self._weather_index]
         print('Weather: %s' % preset[1])
         self.player.get_world().set_weather(preset[0])
+        self._journal_weather(preset)
+        if self.dynamic_weather is not None:
+            self._start_dynamic_weather(preset[0])
+
+    def set_weather(self, name):
+        """Switch to a preset by name, 'ClearNoon' or 'Clear Noon'."""
+        self._weather_index = self._weather_preset(name)
+        preset = self._weather_presets[self._weather_index]
+        print('Weather: %s' % preset[1])
+        self.world.set_weather(preset[0])
+        self._journal_weather(preset)
+        if self.dynamic_weather is not None:
+            self._start_dynamic_weather(preset[0])
+
+    def _weather_preset(self, name):
+        key = name.replace(' ', '').lower()
+        for index, preset in enumerate(self._weather_presets):
+            if preset[1].replace(' ', '').lower() == key:
+                return index
+        raise ValueError('unknown weather preset %r' % name)
+
+    def _journal_weather(self, preset):
+        # Until the run starts its record holds the weather.
+        if self._session_started:
+            self.session.weather(self.world.get_snapshot().frame + 1, preset[1], weather_values(preset[0]))
+
+    def _start_dynamic_weather(self, weather, seed=None):
+        # Sun and storm evolve from this weather (or from the seed) as a
+        # function of the simulation time since now, whatever the tick history.
+        snapshot = self.world.get_snapshot()
+        self.dynamic_weather = WeatherTimeline(
+            self._weather_duration, self.weather_speed, weather=weather, seed=seed)
+        self._weather = self.world.get_weather()
+        self._weather_frame = snapshot.frame
+        self._weather_start = snapshot.timestamp.elapsed_seconds
+        self.data_recorder.set_weather(snapshot.frame, weather_values(weather))
+
+    def _tick_dynamic_weather(self, snapshot):
+        if snapshot.frame - self._weather_frame < self.weather_every:
+            return
+        self.dynamic_weather.apply(self._weather, snapshot.timestamp.elapsed_seconds - self._weather_start)
+        self.world.set_weather(self._weather)
+        # The server renders the new weather from the next frame on.
+        self.data_recorder.set_weather(snapshot.frame + 1, weather_values(self._weather))
+        self._weather_frame = snapshot.frame
 
     def modify_vehicle_physics(self, actor):
         #If actor is not a vehicle, we cannot use the physics control
@@ -264,36 +710,101 @@ class World(object):
         except Exception:
             pass
 
-    def tick(self, clock):
-        self.hud.tick(self, clock)
+    def _on_image(self, image, sub_dir):
+        with self.data_recorder.metrics.timer('callback'):
+            self.data_recorder.gaps.observe(sub_dir, image.frame)
+            self.data_recorder.schedule.seen(sub_dir, image.frame)
+            recording = self.recording and image.frame >= self._record_from
+            if self.lockstep is not None:
+                if recording:
+                    self.lockstep.deliver(sub_dir, image)
+            else:
+                self.data_recorder.data_processing(image, sub_dir, recording)
+
+    def tick(self, clock, frame=None):
+        metrics = self.data_recorder.metrics
+        start = time.perf_counter()
+        if self.hud is not None:
+            self.hud.tick(self, clock)
         #print('lat:{}, lon{}'.format(self.gnss_sensor.lat, self.gnss_sensor.lon)) 
         global loc
         loc = self.player.get_transform()
+        if self.coverage is not None:
+            self._tick_coverage(loc)
+        if self.dynamic_weather is not None or self.route_recorder is not None:
+            snapshot = self.world.get_snapshot()
+            if self.dynamic_weather is not None:
+                self._tick_dynamic_weather(snapshot)
+            if self.route_recorder is not None and self.recording:
+                self.route_recorder.record(self.data_recorder.frame_id(snapshot.frame), self.player)
+        for message in self.data_recorder.gaps.warnings():
+            logging.warning(message)
+            if self.hud is not None:
+                self.hud.notification(message)
+        # The lockstep wait is not part of it, Lockstep keeps its own stats.
+        metrics.observe('world_tick', time.perf_counter() - start)
+        if self.lockstep is not None and frame is not None:
+            if self.recording and frame >= self._record_from:
+                self._ticked.append((frame, loc))
+                while len(self._ticked) >= self.pipeline_depth:
+                    self._collect_frame()
+            else:
+                # The cameras only deliver while recording, nothing to wait for.
+                self._ticked.clear()
+                self.lockstep.discard(frame)
+        metrics.export_if_due()
         # print(loc.location.x, loc.location.y, loc.rotation.yaw) 
 
+    def _collect_frame(self):
+        # Wait for the rig images of the oldest ticked frame, the writer
+        # threads encode them while the server simulates the next ones.
+        frame, pose = self._ticked.popleft()
+        images, complete = self.lockstep.collect(frame)
+        if images and self.recording and frame >= self.data_recorder.first_frame:
+            self.data_recorder.add_bundle(frame, images, complete, pose)
+
     def render(self, display):
         self.camera_manager.render(display)
-        self.hud.render(display)
+        with self.data_recorder.metrics.timer('hud_render'):
+            self.hud.render(display)
 
     def destroy_sensors(self):
         self.camera_manager.sensor.destroy()
         self.camera_manager.sensor = None
         self.camera_manager.index = None
 
-    def destroy(self):
-        sensors = [
-            self.camera_manager.sensor,
-            self.gnss_sensor.sensor,
-            self.camera1,
-            self.camera2,
-            self.camera3
-            ]
-        for sensor in sensors:
-            if sensor is not None:
+    def destroy(self, close_recorder=True):
+        try:
+            while self._ticked:
+                self._collect_frame()
+            sensors = [
+                self.camera_manager.sensor if self.camera_manager is not None else None,
+                self.gnss_sensor.sensor if self.gnss_sensor is not None else None,
+                ] + self.cameras
+            actors = [sensor for sensor in sensors if sensor is not None]
+            for sensor in actors:
                 sensor.stop()
-                sensor.destroy()
-        if self.player is not None:
-            self.player.destroy()
+            if self.player is not None:
+                actors.append(self.player)
+            # One round trip for the whole teardown when we have a client.
+            if self.client is not None:
+                self.client.apply_batch_sync([carla.command.DestroyActor(actor.id) for actor in actors], False)
+            else:
+                for actor in actors:
+                    actor.destroy()
+            self.cameras = []
+        finally:
+            # Sensors are stopped, so nothing new can be queued: flush what
+            # the writer threads already accepted before we exit.
+            if close_recorder:
+                self.data_recorder.close()
+                if self.route_recorder is not None:
+                    self.route_recorder.close()
+                if self.lockstep is not None:
+                    stats = self.lockstep.stats()
+                    print('Lockstep: %d frames, %d complete, missing %s, late %s, mean wait %.1f ms' % (
+                        stats['collected'], stats['complete'], stats['missing'], stats['late'],
+                        1000.0 * stats['mean_wait']))
 
 
 
@@ -302,7 +813,27 @@ class World(object):
 # ==============================================================================
 
 
+def enable_sync_mode(client, sim_world, args):
+    """Switch the server to fixed-step synchronous mode, returns the old settings."""
+    original_settings = sim_world.get_settings()
+    settings = sim_world.get_settings()
+    if not settings.synchronous_mode:
+        settings.synchronous_mode = True
+        settings.fixed_delta_seconds = 0.05
+    sim_world.apply_settings(settings)
+
+    traffic_manager = client.get_trafficmanager(args.tm_port)
+    traffic_manager.set_synchronous_mode(True)
+    if args.seed is not None:
+        traffic_manager.set_random_device_seed(args.seed)
+    return original_settings
+
+
 def game_loop(args):
+    import pygame
+    from hud import HUD
+    from keyboardcontrol import KeyboardControl
+
     pygame.init()
     pygame.font.init()
     world = None
@@ -314,15 +845,7 @@ def game_loop(args):
 
         sim_world = client.get_world()
         if args.sync:
-            original_settings = sim_world.get_settings()
-            settings = sim_world.get_settings()
-            if not settings.synchronous_mode:
-                settings.synchronous_mode = True
-                settings.fixed_delta_seconds = 0.05
-            sim_world.apply_settings(settings)
-
-            traffic_manager = client.get_trafficmanager()
-            traffic_manager.set_synchronous_mode(True)
+            original_settings = enable_sync_mode(client, sim_world, args)
 
         if args.autopilot and not sim_world.get_settings().synchronous_mode:
             print("WARNING: You are currently in asynchronous mode and could "
@@ -334,8 +857,8 @@ def game_loop(args):
         display.fill((0,0,0))
         pygame.display.flip()
 
-        hud = HUD(args.width, args.height)
-        world = World(sim_world, hud, args)
+        hud = HUD(args.width, args.height, vehicle_refresh=args.hud_refresh)
+        world = World(sim_world, hud, args, client)
         controller = KeyboardControl(world, args.autopilot)
 
         if args.sync:
@@ -345,12 +868,13 @@ def game_loop(args):
 
         clock = pygame.time.Clock()
         while True:
+            frame = None
             if args.sync:
-                sim_world.tick()
+                frame = sim_world.tick()
             clock.tick_busy_loop(30)
             if controller.parse_events(client, world, clock, args.sync):
                 return
-            world.tick(clock)
+            world.tick(clock, frame)
             world.render(display)
             pygame.display.flip()
 
@@ -365,12 +889,178 @@ def game_loop(args):
         pygame.quit()
 
 
+# ==============================================================================
+# -- headless_loop() -----------------------------------------------------------
+# ==============================================================================
+
+
+def headless_loop(args, client=None):
+    """Sync tick loop with autopilot and recording only: no window, no HUD.
+
+    Runs until interrupted, or for --frames ticks / --duration simulated
+    seconds, and returns the recorder stats.
+    """
+    world = None
+    original_settings = None
+    ticks = 0
+
+    try:
+        if client is None:
+            client = carla.Client(args.host, args.port)
+            client.set_timeout(2000.0)
+
+        sim_world = client.get_world()
+        original_settings = enable_sync_mode(client, sim_world, args)
+        if args.seed is not None:
+            random.seed(args.seed)
+            np.random.seed(args.seed)
+
+        max_ticks = args.frames
+        if args.duration is not None:
+            max_ticks = int(round(args.duration / sim_world.get_settings().fixed_delta_seconds))
+
+        world = World(sim_world, None, args, client)
+        if args.coverage:
+            world.start_coverage(args.coverage_driver, args.tm_port, args.target_speed)
+        else:
+            world.player.set_autopilot(True, args.tm_port)
+        # Nobody is there to press R: one tick to settle, then record every
+        # frame. The settling tick counts against --frames.
+        world.tick(None, sim_world.tick())
+        ticks = 1
+        world.start_recording(rebase=True)
+
+        last_ticks, last_written = 0, 0
+        last_report = time.time()
+        while (max_ticks is None or ticks < max_ticks) and not world.coverage_done:
+            frame = sim_world.tick()
+            world.tick(None, frame)
+            ticks += 1
+            now = time.time()
+            if now - last_report >= args.report_interval:
+                writer = world.data_recorder.writer
+                elapsed = now - last_report
+                print('ticks: %d (%.1f/s)  frames written: %d (%.1f/s)  queue: %d  dropped: %d  incomplete: %d  skipped: %d' % (
+                    ticks, (ticks - last_ticks) / elapsed,
+                    writer.written, (writer.written - last_written) / elapsed,
+                    writer.queue_depth, writer.dropped, world.data_recorder.bundler.incomplete,
+                    world.data_recorder.gate.skipped))
+                if world.lockstep is not None:
+                    print('lockstep: missing %s  late %s  mean wait %.1f ms' % (
+                        dict(world.lockstep.missing), dict(world.lockstep.late), 1000.0 * world.lockstep.mean_wait))
+                if world.coverage is not None:
+                    print('coverage: %.1f%%  driven %.2f of %.2f km' % (
+                        100.0 * world.coverage.progress, world.travelled / 1000.0, world.coverage_plan.length / 1000.0))
+                sys.stdout.flush()
+                last_ticks, last_written = ticks, writer.written
+                last_report = now
+
+    finally:
+
+        if original_settings:
+            sim_world.apply_settings(original_settings)
+
+        if world is not None:
+            world.destroy()
+
+    stats = world.data_recorder.stats()
+    stats['ticks'] = ticks
+    if world.coverage is not None:
+        stats['coverage'] = dict(
+            world.coverage.stats(), driven_m=world.travelled, tour_m=world.coverage_plan.length,
+            unreachable=len(world.coverage_plan.unreachable))
+    return stats
+
+
+# ==============================================================================
+# -- replay_loop() -------------------------------------------------------------
+# ==============================================================================
+
+
+def replay_loop(args, client=None):
+    """Drive a route saved with --record-route again, once per weather preset.
+
+    The car is teleported to the recorded transform on every sync tick, so
+    each traversal is a session <output-dir>/<session>/<preset> with the
+    same frame indices as the recorded drive. With --resume traversals
+    journaled complete are skipped, one cut short is driven again from the
+    start. Returns the recorder stats per preset.
+    """
+    route = Route(args.replay_route)
+    if args.replay_weathers:
+        weathers = args.replay_weathers.split(',')
+    else:
+        weathers = [preset[1].replace(' ', '') for preset in find_weather_presets()]
+    session, resume = args.session, args.resume
+    if session is None:
+        latest = latest_session(args.output_dir) if resume else None
+        if resume and latest is None:
+            raise ValueError('%s: no session to resume' % args.output_dir)
+        session = os.path.dirname(latest) if resume else new_session_id(args.output_dir)
+    original_settings = None
+    stats = {}
+
+    try:
+        if client is None:
+            client = carla.Client(args.host, args.port)
+            client.set_timeout(2000.0)
+
+        sim_world = client.get_world()
+        if route.town and sim_world.get_map().name.split('/')[-1] != route.town:
+            sim_world = client.load_world(route.town)
+        original_settings = enable_sync_mode(client, sim_world, args)
+
+        for weather in weathers:
+            args.session = os.path.join(session, weather)
+            args.resume = resume and os.path.isdir(os.path.join(args.output_dir, args.session))
+            if args.resume and run_complete(os.path.join(args.output_dir, args.session)):
+                print('%s: already complete' % args.session)
+                continue
+            args.weather = weather
+            world = World(sim_world, None, args, client)
+            try:
+                replay_route(world, sim_world, route)
+                world.session.complete()
+            finally:
+                world.destroy()
+            stats[weather] = world.data_recorder.stats()
+
+    finally:
+
+        args.session, args.resume = session, resume
+        if original_settings:
+            sim_world.apply_settings(original_settings)
+
+    return stats
+
+
+def replay_route(world, sim_world, route):
+    world.player.set_simulate_physics(False)
+    recorder = world.data_recorder
+    first_frame = sim_world.get_snapshot().frame + 1
+    recorder.first_frame = first_frame
+    # Step i is saved under the frame id the drive saved it under, gaps
+    # in the recorded frames (async mode, R pressed twice) included.
+    recorder.frame_ids = lambda frame: int(route.frames[frame - first_frame])
+    recorder.pose_source = lambda frame: route.transform(frame - first_frame)
+    # A traversal cut short is driven again from the start, only the
+    # frames it did not get to are written.
+    if world.session.next_frame:
+        recorder.saved_frames = world.session.saved_frames()
+    world.recording = True
+    for step in range(len(route)):
+        world.player.set_transform(route.transform(step))
+        world.player.apply_control(route.control(step))
+        frame = sim_world.tick()
+        world.tick(None, frame)
+
+
 # ==============================================================================
 # -- main() --------------------------------------------------------------------
 # ==============================================================================
 
 
-def main():
+def build_argparser():
     argparser = argparse.ArgumentParser(
         description='CARLA Manual Control Client')
     argparser.add_argument(
@@ -417,10 +1107,240 @@ def main():
         '--sync',
         action='store_true',
         help='Activate synchronous mode execution')
-    args = argparser.parse_args()
+    argparser.add_argument(
+        '--hud-refresh',
+        metavar='SECONDS',
+        default=0.5,
+        type=float,
+        help='how often the HUD refreshes its list of nearby vehicles (default: 0.5)')
+    argparser.add_argument(
+        '--headless',
+        action='store_true',
+        help='no window: sync mode, autopilot and recording only')
+    argparser.add_argument(
+        '--report-interval',
+        metavar='SECONDS',
+        default=5.0,
+        type=float,
+        help='seconds between throughput lines in headless mode (default: 5.0)')
+    argparser.add_argument(
+        '--frames',
+        metavar='N',
+        default=None,
+        type=int,
+        help='stop a headless run after this many ticks')
+    argparser.add_argument(
+        '--duration',
+        metavar='SECONDS',
+        default=None,
+        type=float,
+        help='stop a headless run after this much simulated time')
+    argparser.add_argument(
+        '--output-dir',
+        metavar='DIR',
+        default='data',
+        help='directory the sessions are written to (default: data)')
+    argparser.add_argument(
+        '--session',
+        metavar='NAME',
+        default=None,
+        help='session directory under --output-dir (default: the local time, e.g. 20240131-142501)')
+    argparser.add_argument(
+        '--resume',
+        action='store_true',
+        help='continue --session, or the last session of --output-dir, after its last frame')
+    argparser.add_argument(
+        '--weather',
+        metavar='PRESET',
+        default=None,
+        help='start with this weather preset, e.g. ClearNoon')
+    argparser.add_argument(
+        '--seed',
+        default=None,
+        type=int,
+        help='seed the Traffic Manager and the client random generators')
+    argparser.add_argument(
+        '--coverage',
+        action='store_true',
+        help='headless: drive a planned tour over every lane of the town instead of wandering, stop once it is covered')
+    argparser.add_argument(
+        '--coverage-driver',
+        choices=['tm', 'follower'],
+        default='tm',
+        help='drive the tour with the Traffic Manager (set_path) or a waypoint follower (default: tm)')
+    argparser.add_argument(
+        '--target-speed',
+        metavar='KMH',
+        default=30.0,
+        type=float,
+        help='speed of the waypoint follower in km/h (default: 30)')
+    argparser.add_argument(
+        '--lockstep',
+        action='store_true',
+        help='sync mode, and after every tick wait until each camera delivered that frame')
+    argparser.add_argument(
+        '--lockstep-timeout',
+        metavar='SECONDS',
+        default=1.0,
+        type=float,
+        help='give up waiting for the cameras of a frame after this long (default: 1.0)')
+    argparser.add_argument(
+        '--pipeline-depth',
+        metavar='N',
+        default=2,
+        type=int,
+        help='lockstep: frames simulated ahead of the one being collected, plus one (default: 2)')
+    argparser.add_argument(
+        '--dynamic-weather',
+        action='store_true',
+        help='evolve sun and storms from the sync loop and stamp the weather into every frame')
+    argparser.add_argument(
+        '--weather-every',
+        metavar='N',
+        default=10,
+        type=int,
+        help='frames between dynamic weather updates (default: 10)')
+    argparser.add_argument(
+        '--weather-speed',
+        metavar='FACTOR',
+        default=1.0,
+        type=float,
+        help='rate at which the dynamic weather changes (default: 1.0)')
+    argparser.add_argument(
+        '--record-route',
+        metavar='FILE',
+        default=None,
+        help='save the ego transform and controls of every recorded tick to FILE (.npz)')
+    argparser.add_argument(
+        '--replay-route',
+        metavar='FILE',
+        default=None,
+        help='headless: drive a route saved with --record-route once per weather preset')
+    argparser.add_argument(
+        '--replay-weathers',
+        metavar='PRESETS',
+        default=None,
+        help='comma separated presets to replay under (default: all of them)')
+    argparser.add_argument(
+        '--tm-port',
+        metavar='P',
+        default=8000,
+        type=int,
+        help='port of the Traffic Manager (default: 8000)')
+    argparser.add_argument(
+        '--metrics-interval',
+        metavar='SECONDS',
+        default=10.0,
+        type=float,
+        help='seconds between stage latency exports to metrics.prom and metrics.csv, 0 disables (default: 10)')
+    argparser.add_argument(
+        '--gap-threshold',
+        metavar='RATE',
+        default=0.01,
+        type=float,
+        help='warn when a camera loses more than this fraction of its recent frames, 0 disables (default: 0.01)')
+    argparser.add_argument(
+        '--writer-threads',
+        metavar='N',
+        default=2,
+        type=int,
+        help='number of threads writing frames to disk (default: 2)')
+    argparser.add_argument(
+        '--writer-queue',
+        metavar='N',
+        default=64,
+        type=int,
+        help='max frames waiting to be written (default: 64)')
+    argparser.add_argument(
+        '--backpressure',
+        choices=AsyncWriter.POLICIES,
+        default='block',
+        help='what to do when the write queue is full (default: block)')
+    argparser.add_argument(
+        '--output-format',
+        choices=['files', 'shards', 'raw'],
+        default='files',
+        help='one jpg per frame, rolling tar shards with a per-frame json sidecar, '
+             'or lossless raw BGR frames in chunked .npy memmaps (default: files)')
+    argparser.add_argument(
+        '--encoder',
+        choices=sorted(ENCODERS),
+        default='jpeg',
+        help='image encoder of the files and shards formats (default: jpeg), '
+             'see python -m benchmarks.encoders')
+    argparser.add_argument(
+        '--quality',
+        default=None,
+        type=int,
+        help='quality of the jpeg, webp, turbojpeg and pil encoders')
+    argparser.add_argument(
+        '--png-level',
+        default=None,
+        type=int,
+        help='compression level of the png encoder, 0-9 (default: 3)')
+    argparser.add_argument(
+        '--shard-size',
+        metavar='MB',
+        default=512,
+        type=int,
+        help='roll over to a new shard after this many megabytes (default: 512)')
+    argparser.add_argument(
+        '--chunk-frames',
+        metavar='N',
+        default=500,
+        type=int,
+        help='frames per .npy chunk in raw output mode (default: 500)')
+    argparser.add_argument(
+        '--num-cams',
+        metavar='N',
+        default=1,
+        type=int,
+        choices=[1, 2, 3],
+        help='cameras in the 0/120/240 degree rig (default: 1)')
+    argparser.add_argument(
+        '--rig',
+        metavar='FILE',
+        default=None,
+        help='JSON or YAML file describing the cameras of the rig, replaces --num-cams')
+    argparser.add_argument(
+        '--bundle-timeout',
+        metavar='SECONDS',
+        default=0.5,
+        type=float,
+        help='write a frame with the cameras that arrived after this long (default: 0.5)')
+    argparser.add_argument(
+        '--min-distance',
+        metavar='METRES',
+        default=0.0,
+        type=float,
+        help='only save a frame after moving this far since the last saved one (default: 0, off)')
+    argparser.add_argument(
+        '--min-yaw',
+        metavar='DEGREES',
+        default=0.0,
+        type=float,
+        help='or after turning this much since the last saved one (default: 0, off)')
+    argparser.add_argument(
+        '--revisit-radius',
+        metavar='METRES',
+        default=10.0,
+        type=float,
+        help='saved frames this close to the car count as a revisit in the HUD (default: 10)')
+    return argparser
+
+
+def parse_args(argv=None):
+    args = build_argparser().parse_args(argv)
 
     args.width, args.height = [int(x) for x in args.res.split('x')]
     args.cam_res_x, args.cam_res_y = [int(x) for x in args.camres.split('x')]
+    if args.lockstep:
+        args.sync = True
+    return args
+
+
+def main():
+    args = parse_args()
 
     log_level = logging.DEBUG if args.debug else logging.INFO
     logging.basicConfig(format='%(levelname)s: %(message)s', level=log_level)
@@ -431,7 +1351,12 @@ def main():
 
     try:
 
-        game_loop(args)
+        if args.replay_route:
+            replay_loop(args)
+        elif args.headless:
+            headless_loop(args)
+        else:
+            game_loop(args)
 
     except KeyboardInterrupt:
         print('\nCancelled by user. Bye!')
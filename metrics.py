@@ -0,0 +1,135 @@
+import csv
+import os
+import threading
+import time
+
+import numpy as np
+
+
+# Upper bounds in seconds of the cumulative histogram buckets.
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+# ==============================================================================
+# -- StageStats ----------------------------------------------------------------
+# ==============================================================================
+
+
+class StageStats(object):
+    """Latencies of one stage: lifetime bucket counts plus the last window samples."""
+
+    def __init__(self, window=1024):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = np.zeros(len(BUCKETS) + 1, dtype=np.int64)
+        self._recent = np.zeros(window)
+
+    def observe(self, seconds):
+        self._recent[self.count % len(self._recent)] = seconds
+        self.count += 1
+        self.total += seconds
+        self.buckets[np.searchsorted(BUCKETS, seconds)] += 1
+
+    def recent(self):
+        return self._recent[:min(self.count, len(self._recent))]
+
+    def percentiles(self, *q):
+        recent = self.recent()
+        if not len(recent):
+            return (0.0,) * len(q)
+        return tuple(np.percentile(recent, q))
+
+
+class Timer(object):
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+
+
+# ==============================================================================
+# -- Metrics -------------------------------------------------------------------
+# ==============================================================================
+
+
+class Metrics(object):
+    """Per-stage latency histograms of the capture path, exported as files.
+
+    Stages time themselves with ``with metrics.timer('encode'):`` from any
+    thread. export() writes a Prometheus text file (metrics.prom) and
+    appends one row per stage to metrics.csv in out_dir, export_if_due()
+    does so at most every interval seconds.
+    """
+
+    def __init__(self, out_dir, interval=10.0, window=1024, prefix='vpr'):
+        self.out_dir = out_dir
+        self.interval = interval
+        self.window = window
+        self.prefix = prefix
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._start = time.time()
+        self._last_export = self._start
+
+    def timer(self, stage):
+        return Timer(self, stage)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats(self.window)
+            stats.observe(seconds)
+
+    def summary(self, stage):
+        """(p50, p99) of the recent latencies of stage, in seconds."""
+        with self._lock:
+            stats = self.stages.get(stage)
+            return stats.percentiles(50, 99) if stats is not None else (0.0, 0.0)
+
+    def export_if_due(self):
+        if self.interval and time.time() - self._last_export >= self.interval:
+            self.export()
+
+    def export(self):
+        now = time.time()
+        with self._lock:
+            rows = []
+            lines = [
+                '# HELP %s_stage_seconds Latency of a stage of the capture path.' % self.prefix,
+                '# TYPE %s_stage_seconds histogram' % self.prefix]
+            for stage in sorted(self.stages):
+                stats = self.stages[stage]
+                cumulative = np.cumsum(stats.buckets)
+                for bound, count in zip(BUCKETS, cumulative):
+                    lines.append('%s_stage_seconds_bucket{stage="%s",le="%g"} %d' % (
+                        self.prefix, stage, bound, count))
+                lines.append('%s_stage_seconds_bucket{stage="%s",le="+Inf"} %d' % (
+                    self.prefix, stage, stats.count))
+                lines.append('%s_stage_seconds_sum{stage="%s"} %.9f' % (self.prefix, stage, stats.total))
+                lines.append('%s_stage_seconds_count{stage="%s"} %d' % (self.prefix, stage, stats.count))
+                p50, p99 = stats.percentiles(50, 99)
+                recent = stats.recent()
+                rows.append([
+                    '%.3f' % now, stage, stats.count,
+                    '%.3f' % (1e3 * recent.mean()) if len(recent) else '',
+                    '%.3f' % (1e3 * p50), '%.3f' % (1e3 * p99)])
+            self._last_export = now
+        path = os.path.join(self.out_dir, 'metrics.prom')
+        with open(path + '.tmp', 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        # Scrapers never see a half written file.
+        os.replace(path + '.tmp', path)
+        path = os.path.join(self.out_dir, 'metrics.csv')
+        new = not os.path.isfile(path)
+        with open(path, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if new:
+                writer.writerow(['time', 'stage', 'count', 'mean_ms', 'p50_ms', 'p99_ms'])
+            writer.writerows(rows)
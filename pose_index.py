@@ -0,0 +1,135 @@
+import math
+import threading
+
+import numpy as np
+
+
+# ==============================================================================
+# -- PoseIndex -----------------------------------------------------------------
+# ==============================================================================
+
+
+class PoseIndex(object):
+    """Incremental uniform-grid index over saved (frame, x, y, yaw) poses.
+
+    Poses live in growable NumPy arrays and every grid cell keeps the
+    positions of the poses inside it, so a query only looks at the few
+    cells around the query point whatever the size of the index.
+    """
+
+    def __init__(self, cell_size=10.0, capacity=1024):
+        self.cell_size = float(cell_size)
+        self.count = 0
+        self._frames = np.zeros(capacity, dtype=np.int64)
+        self._xy = np.zeros((capacity, 2), dtype=np.float64)
+        self._yaw = np.zeros(capacity, dtype=np.float64)
+        self._cells = {}
+        self._bounds = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def add(self, frame, x, y, yaw=0.0):
+        with self._lock:
+            if self.count == len(self._frames):
+                self._grow()
+            n = self.count
+            self._frames[n] = frame
+            self._xy[n] = (x, y)
+            self._yaw[n] = yaw
+            cell = self._cell(x, y)
+            self._cells.setdefault(cell, []).append(n)
+            if self._bounds is None:
+                self._bounds = [cell[0], cell[1], cell[0], cell[1]]
+            else:
+                self._bounds = [
+                    min(self._bounds[0], cell[0]), min(self._bounds[1], cell[1]),
+                    max(self._bounds[2], cell[0]), max(self._bounds[3], cell[1])]
+            self.count += 1
+
+    def radius(self, x, y, r, return_distance=False):
+        """Frames saved within r metres of (x, y), nearest first."""
+        with self._lock:
+            ci, cj = self._cell(x, y)
+            reach = int(math.ceil(r / self.cell_size))
+            candidates = self._gather(ci - reach, cj - reach, ci + reach, cj + reach)
+            return self._select(candidates, x, y, r, None, return_distance)
+
+    def nearest(self, x, y, k=1, return_distance=False):
+        """The k frames saved closest to (x, y), nearest first."""
+        with self._lock:
+            if self.count == 0:
+                return self._select([], x, y, None, k, return_distance)
+            ci, cj = self._cell(x, y)
+            i0, j0, i1, j1 = self._bounds
+            ring = max(0, i0 - ci, ci - i1, j0 - cj, cj - j1)
+            candidates = self._gather(ci - ring, cj - ring, ci + ring, cj + ring)
+            # Grow a square of cells around the query until it holds k poses
+            # and the k-th of them is closer than any unvisited cell could be.
+            while True:
+                if len(candidates) >= k:
+                    d = np.hypot(*(self._xy[candidates] - (x, y)).T)
+                    if np.partition(d, k - 1)[k - 1] <= ring * self.cell_size:
+                        break
+                if ci - ring <= i0 and cj - ring <= j0 and ci + ring >= i1 and cj + ring >= j1:
+                    break
+                ring += 1
+                candidates += self._ring(ci, cj, ring)
+            return self._select(candidates, x, y, None, k, return_distance)
+
+    def revisits(self, x, y, r, frame, min_frame_gap):
+        """How many frames within r metres were saved min_frame_gap frames ago or earlier."""
+        with self._lock:
+            ci, cj = self._cell(x, y)
+            reach = int(math.ceil(r / self.cell_size))
+            candidates = self._gather(ci - reach, cj - reach, ci + reach, cj + reach)
+            if not candidates:
+                return 0
+            candidates = np.array(candidates)
+            d = np.hypot(*(self._xy[candidates] - (x, y)).T)
+            old = self._frames[candidates] <= frame - min_frame_gap
+            return int(np.count_nonzero((d <= r) & old))
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def _gather(self, i0, j0, i1, j1):
+        if self._bounds is None:
+            return []
+        i0, j0 = max(i0, self._bounds[0]), max(j0, self._bounds[1])
+        i1, j1 = min(i1, self._bounds[2]), min(j1, self._bounds[3])
+        candidates = []
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                candidates += self._cells.get((i, j), ())
+        return candidates
+
+    def _ring(self, ci, cj, ring):
+        candidates = []
+        for i in range(ci - ring, ci + ring + 1):
+            candidates += self._cells.get((i, cj - ring), ())
+            candidates += self._cells.get((i, cj + ring), ())
+        for j in range(cj - ring + 1, cj + ring):
+            candidates += self._cells.get((ci - ring, j), ())
+            candidates += self._cells.get((ci + ring, j), ())
+        return candidates
+
+    def _select(self, candidates, x, y, r, k, return_distance):
+        candidates = np.array(candidates, dtype=np.int64)
+        d = np.hypot(*(self._xy[candidates] - (x, y)).T) if len(candidates) else np.zeros(0)
+        if r is not None:
+            keep = d <= r
+            candidates, d = candidates[keep], d[keep]
+        if k is not None and len(d) > k:
+            keep = np.argpartition(d, k - 1)[:k]
+            candidates, d = candidates[keep], d[keep]
+        order = np.argsort(d)
+        frames = self._frames[candidates[order]]
+        return (frames, d[order]) if return_distance else frames
+
+    def _grow(self):
+        size = 2 * len(self._frames)
+        self._frames = np.resize(self._frames, size)
+        self._xy = np.resize(self._xy, (size, 2))
+        self._yaw = np.resize(self._yaw, size)
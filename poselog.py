@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+"""
+Binary append-only pose log.
+
+Poses are stored as fixed-dtype numpy records behind a small JSON header, so
+the recorder can append them in batches and readers can memory-map millions
+of rows without parsing text.
+
+Convert a log to the legacy data.csv layout (or parquet):
+
+    python poselog.py data/poses.bin data/data.csv
+"""
+
+import argparse
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+
+MAGIC = b'VPRPOSE1'
+HEADER_ALIGN = 64
+
+POSE_DTYPE = np.dtype([
+    ('frame', '<i8'),
+    ('timestamp', '<f8'),
+    ('x', '<f8'),
+    ('y', '<f8'),
+    ('z', '<f8'),
+    ('yaw', '<f8')])
+
+
+# ==============================================================================
+# -- PoseLog -------------------------------------------------------------------
+# ==============================================================================
+
+
+class PoseLog(object):
+    """Buffers pose records in memory and appends them to disk in batches."""
+
+    def __init__(self, path, dtype=POSE_DTYPE, batch_size=256, flush_interval=1.0):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.flush_interval = flush_interval
+        self.count = 0
+        self._buffer = np.zeros(batch_size, dtype=self.dtype)
+        self._pending = 0
+        self._last_flush = time.time()
+        self._lock = threading.Lock()
+        if os.path.isfile(path) and os.path.getsize(path) > 0:
+            header_size, stored = read_header(path)
+            if stored != self.dtype:
+                raise ValueError('%s holds records of a different layout' % path)
+            # Drop a torn record left behind by a crash before appending.
+            self.count = (os.path.getsize(path) - header_size) // self.dtype.itemsize
+            with open(path, 'r+b') as f:
+                f.truncate(header_size + self.count * self.dtype.itemsize)
+            self._file = open(path, 'ab')
+        else:
+            self._file = open(path, 'wb')
+            self._file.write(make_header(self.dtype))
+            self._file.flush()
+
+    def append(self, record):
+        """Append one record, a tuple in the field order of the log dtype."""
+        with self._lock:
+            self._buffer[self._pending] = record
+            self._pending += 1
+            self.count += 1
+            if self._pending == len(self._buffer) or \
+                    time.time() - self._last_flush > self.flush_interval:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._file.close()
+
+    def _flush(self):
+        if self._pending:
+            self._file.write(self._buffer[:self._pending].tobytes())
+            self._pending = 0
+        self._file.flush()
+        self._last_flush = time.time()
+
+
+# ==============================================================================
+# -- Reading -------------------------------------------------------------------
+# ==============================================================================
+
+
+def make_header(dtype):
+    meta = json.dumps({'dtype': np.lib.format.dtype_to_descr(dtype)}).encode('utf-8')
+    size = len(MAGIC) + 4 + len(meta)
+    size += -size % HEADER_ALIGN
+    header = MAGIC + struct.pack('<I', size) + meta
+    return header + b' ' * (size - len(header))
+
+
+def read_header(path):
+    """Return (header size, record dtype) of a pose log."""
+    with open(path, 'rb') as f:
+        head = f.read(len(MAGIC) + 4)
+        if head[:len(MAGIC)] != MAGIC:
+            raise ValueError('%s is not a pose log' % path)
+        size = struct.unpack('<I', head[len(MAGIC):])[0]
+        meta = json.loads(f.read(size - len(head)).decode('utf-8'))
+    descr = meta['dtype']
+    if isinstance(descr, list):
+        descr = [tuple(field) for field in descr]
+    return size, np.lib.format.descr_to_dtype(descr)
+
+
+def read_pose_log(path):
+    """Memory-map a pose log as a read-only structured array."""
+    header_size, dtype = read_header(path)
+    count = (os.path.getsize(path) - header_size) // dtype.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=header_size, shape=(count,))
+
+
+def to_dataframe(records):
+    """Records as a DataFrame in the legacy data.csv column layout."""
+    import pandas as pd
+    data = {'Frame': ['f{:08d}'.format(frame) for frame in records['frame']]}
+    for name in records.dtype.names:
+        if name != 'frame':
+            data[name] = np.asarray(records[name])
+    columns = ['Frame', 'x', 'y', 'yaw']
+    columns += [name for name in data if name not in columns]
+    return pd.DataFrame(data, columns=columns)
+
+
+def convert(path, out_path):
+    df = to_dataframe(read_pose_log(path))
+    if out_path.endswith('.parquet'):
+        df.to_parquet(out_path, index=False)
+    else:
+        df.to_csv(out_path, index=False)
+    return len(df)
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description='Convert a binary pose log to CSV or Parquet')
+    argparser.add_argument(
+        'log',
+        help='pose log written by the recorder (e.g. data/poses.bin)')
+    argparser.add_argument(
+        'out',
+        help='output file, .csv or .parquet')
+    args = argparser.parse_args()
+
+    rows = convert(args.log, args.out)
+    print('Wrote %d rows to %s' % (rows, args.out))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+
+"""
+Streaming reader over sessions written by the collector.
+
+Yields (images, poses, frames, cameras) batches as NumPy arrays: images are
+BGR uint8 (N, H, W, 3), poses float64 (N, 3) holding x, y and yaw, frames
+int64 (N,) and cameras the camera sub-directory of every image. JPEGs are
+decoded in a thread pool with a few batches in flight. Rig cameras can have
+different resolutions, the images of a batch all have the same one.
+
+    for images, poses, frames, cameras in SessionReader('data', batch_size=64):
+        ...
+
+Measure decode throughput of a session, or of every session under a
+directory:
+
+    python reader.py data/20240131-142501 --benchmark
+    python reader.py data --benchmark
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import random
+import time
+
+import cv2
+import numpy as np
+
+from encoders import decode
+from framestore import FrameStoreReader
+from poselog import read_pose_log
+from sessions import list_sessions
+from shards import ShardReader
+
+
+# ==============================================================================
+# -- SessionReader -------------------------------------------------------------
+# ==============================================================================
+
+
+class SessionReader(object):
+    """Reads the files, shards or raw layout of one data directory."""
+
+    def __init__(self, data_dir, batch_size=32, workers=4, prefetch=4, shuffle_buffer=0, seed=None,
+                 cameras=None):
+        self.data_dir = data_dir
+        self.batch_size = batch_size
+        self.workers = workers
+        self.prefetch = prefetch
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        self._shards = None
+        self._stores = {}
+        self.metadata = {}
+        if os.path.isfile(os.path.join(data_dir, 'recorder.json')):
+            with open(os.path.join(data_dir, 'recorder.json')) as f:
+                self.metadata = json.load(f)
+        if os.path.isfile(os.path.join(data_dir, 'shards', 'index.jsonl')):
+            self.format = 'shards'
+            self._shards = ShardReader(os.path.join(data_dir, 'shards'))
+            samples = []
+            for key in self._shards.keys():
+                frame_name, camera = key.split('_', 1)
+                samples.append((int(frame_name[1:]), camera, key))
+        elif os.path.isdir(os.path.join(data_dir, 'raw')):
+            self.format = 'raw'
+            samples = []
+            for camera in sorted(os.listdir(os.path.join(data_dir, 'raw'))):
+                store = FrameStoreReader(os.path.join(data_dir, 'raw', camera))
+                self._stores[camera] = store
+                samples += [(int(frame), camera, position) for position, frame in enumerate(store.frames)]
+        else:
+            self.format = 'files'
+            samples = []
+            if 'cameras' in self.metadata:
+                names = sorted(self.metadata['cameras'])
+            else:
+                # Sessions from before recorder.json only had the default rig.
+                names = [name for name in sorted(os.listdir(data_dir)) if name.startswith('cam')]
+            for camera in names:
+                cam_dir = os.path.join(data_dir, camera)
+                if not os.path.isdir(cam_dir):
+                    continue
+                samples += [
+                    (int(os.path.splitext(name)[0][1:]), camera, os.path.join(cam_dir, name))
+                    for name in sorted(os.listdir(cam_dir)) if name.startswith('f')]
+        if cameras is not None:
+            samples = [sample for sample in samples if sample[1] in cameras]
+        self.samples = samples
+        self.poses = self._lookup_poses(np.array([s[0] for s in samples], dtype=np.int64))
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __iter__(self):
+        pending = collections.deque()
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as pool:
+            # One batch being filled per resolution.
+            batches = collections.OrderedDict()
+            for n in self._order():
+                resolution = self._resolution(self.samples[n][1])
+                batch = batches.setdefault(resolution, [])
+                batch.append(n)
+                if len(batch) == self.batch_size:
+                    del batches[resolution]
+                    pending.append((batch, [pool.submit(self._load, n) for n in batch]))
+                    if len(pending) > self.prefetch:
+                        yield self._collect(*pending.popleft())
+            for batch in batches.values():
+                pending.append((batch, [pool.submit(self._load, n) for n in batch]))
+            while pending:
+                yield self._collect(*pending.popleft())
+
+    def _order(self):
+        if not self.shuffle_buffer:
+            for n in range(len(self.samples)):
+                yield n
+            return
+        # Shuffle within a sliding window, which keeps reads mostly local.
+        rng = random.Random(self.seed)
+        buffer = []
+        for n in range(len(self.samples)):
+            buffer.append(n)
+            if len(buffer) >= self.shuffle_buffer:
+                i = rng.randrange(len(buffer))
+                buffer[i], buffer[-1] = buffer[-1], buffer[i]
+                yield buffer.pop()
+        rng.shuffle(buffer)
+        for n in buffer:
+            yield n
+
+    def _load(self, n):
+        frame, camera, key = self.samples[n]
+        if self.format == 'raw':
+            return self._stores[camera][key]
+        if self.format == 'shards':
+            ext = next(name for name in self._shards.index[key] if name not in ('key', 'shard', 'json'))
+            return decode(self._shards.read(key, ext), ext, *self._resolution(camera))
+        if key.endswith('.bgra'):
+            with open(key, 'rb') as f:
+                return decode(f.read(), 'bgra', *self._resolution(camera))
+        return cv2.imread(key, cv2.IMREAD_COLOR)
+
+    def _resolution(self, camera):
+        width, height = self.metadata.get('cameras', {}).get(camera, (None, None))
+        return width, height
+
+    def _collect(self, batch, futures):
+        images = np.stack([future.result() for future in futures])
+        frames = np.array([self.samples[n][0] for n in batch], dtype=np.int64)
+        cameras = np.array([self.samples[n][1] for n in batch])
+        return images, self.poses[batch], frames, cameras
+
+    def _lookup_poses(self, frames):
+        poses = np.full((len(frames), 3), np.nan)
+        pose_path = os.path.join(self.data_dir, 'poses.bin')
+        csv_path = os.path.join(self.data_dir, 'data.csv')
+        if os.path.isfile(pose_path):
+            records = read_pose_log(pose_path)
+            known = np.asarray(records['frame'])
+            table = np.stack([records['x'], records['y'], records['yaw']], axis=1)
+        elif os.path.isfile(csv_path):
+            import pandas as pd
+            df = pd.read_csv(csv_path)
+            if df.columns[0].startswith('Unnamed'):
+                # The original collector wrote the header with the index
+                # column (",Frame,x,y,yaw") and the rows without it.
+                df = pd.read_csv(csv_path, header=None, skiprows=1, names=['Frame', 'x', 'y', 'yaw'])
+            known = df['Frame'].str[1:].astype(np.int64).to_numpy()
+            table = df[['x', 'y', 'yaw']].to_numpy(dtype=np.float64)
+        else:
+            return poses
+        if len(known) == 0:
+            return poses
+        order = np.argsort(known, kind='stable')
+        known, table = known[order], table[order]
+        position = np.clip(np.searchsorted(known, frames), 0, len(known) - 1)
+        found = known[position] == frames
+        poses[found] = table[position[found]]
+        return poses
+
+
+# ==============================================================================
+# -- benchmark -----------------------------------------------------------------
+# ==============================================================================
+
+
+def benchmark(reader, max_batches=None):
+    """Decode the session once, returns (images, seconds)."""
+    images = 0
+    start = time.perf_counter()
+    for n, batch in enumerate(reader):
+        images += len(batch[0])
+        if max_batches is not None and n + 1 >= max_batches:
+            break
+    return images, time.perf_counter() - start
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description='Read a session collected by main.py')
+    argparser.add_argument(
+        'data_dir',
+        help='session directory written by the recorder, or the directory holding the sessions (e.g. data)')
+    argparser.add_argument(
+        '--batch-size',
+        default=32,
+        type=int,
+        help='images per batch (default: 32)')
+    argparser.add_argument(
+        '--workers',
+        default=4,
+        type=int,
+        help='decoding threads (default: 4)')
+    argparser.add_argument(
+        '--prefetch',
+        default=4,
+        type=int,
+        help='batches decoded ahead of the consumer (default: 4)')
+    argparser.add_argument(
+        '--shuffle-buffer',
+        default=0,
+        type=int,
+        help='shuffle within a window of this many images (default: 0, off)')
+    argparser.add_argument(
+        '--benchmark',
+        action='store_true',
+        help='decode the session and report images per second')
+    argparser.add_argument(
+        '--max-batches',
+        default=None,
+        type=int,
+        help='stop the benchmark after this many batches')
+    args = argparser.parse_args()
+
+    # Frame ids are local to a session, every session is read on its own.
+    for data_dir in list_sessions(args.data_dir) or [args.data_dir]:
+        reader = SessionReader(
+            data_dir, batch_size=args.batch_size, workers=args.workers,
+            prefetch=args.prefetch, shuffle_buffer=args.shuffle_buffer)
+        print('%s: %d images in %s layout' % (data_dir, len(reader), reader.format))
+        if args.benchmark:
+            images, seconds = benchmark(reader, args.max_batches)
+            print('decoded %d images in %.2f s: %.1f images/s' % (images, seconds, images / max(seconds, 1e-9)))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,115 @@
+"""
+Camera rig attached to the ego vehicle.
+
+A rig file is JSON (or YAML if PyYAML is installed), a list of sensors or
+{"sensors": [...]}. Every sensor is a camera blueprint with its mount point
+relative to the car, only "name" is required:
+
+    {"sensors": [
+        {"name": "front", "type": "sensor.camera.rgb", "x": 0.5, "z": 3.4,
+         "yaw": 0, "width": 1280, "height": 720, "fov": 120},
+        {"name": "left", "yaw": -90, "sensor_tick": 0.1},
+        {"name": "seg", "type": "sensor.camera.semantic_segmentation", "sub_dir": "seg_front"}]}
+
+Images of a sensor are saved in its "sub_dir", the name by default.
+"""
+
+import json
+import math
+
+import carla
+import numpy as np
+
+
+SENSOR_DEFAULTS = {
+    'type': 'sensor.camera.rgb',
+    'x': 0.5,
+    'y': 0.0,
+    'z': 3.4,
+    'pitch': 0.0,
+    'yaw': 0.0,
+    'roll': 0.0,
+    'fov': 120.0,
+    'sensor_tick': 0.0,
+    'attributes': {}}
+
+
+def load_rig(path, width=640, height=480):
+    """Sensors of a rig file, with every field filled in."""
+    with open(path) as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    if isinstance(spec, dict):
+        spec = spec['sensors']
+    rig = []
+    for sensor in spec:
+        sensor = dict(dict(SENSOR_DEFAULTS, width=width, height=height), **sensor)
+        if not sensor['type'].startswith('sensor.camera.'):
+            raise ValueError('%s: only camera sensors can be part of the rig, not %s' % (
+                sensor['name'], sensor['type']))
+        sensor.setdefault('sub_dir', sensor['name'])
+        rig.append(sensor)
+    if len(set(sensor['sub_dir'] for sensor in rig)) != len(rig):
+        raise ValueError('%s: two sensors write to the same sub_dir' % path)
+    return rig
+
+
+def default_rig(num_cams, width, height):
+    """cam1 looks ahead, cam2 and cam3 at 120 and 240 degrees."""
+    return [
+        dict(SENSOR_DEFAULTS, name='cam%d' % (n + 1), sub_dir='cam%d' % (n + 1), yaw=120.0 * n,
+             width=width, height=height)
+        for n in range(num_cams)]
+
+
+def sensor_blueprint(blueprint_library, sensor):
+    bp = blueprint_library.find(sensor['type'])
+    bp.set_attribute('image_size_x', str(sensor['width']))
+    bp.set_attribute('image_size_y', str(sensor['height']))
+    bp.set_attribute('fov', str(sensor['fov']))
+    bp.set_attribute('sensor_tick', str(sensor['sensor_tick']))
+    for name, value in sensor['attributes'].items():
+        bp.set_attribute(name, str(value))
+    return bp
+
+
+def sensor_transform(sensor):
+    return carla.Transform(
+        carla.Location(x=sensor['x'], y=sensor['y'], z=sensor['z']),
+        carla.Rotation(pitch=sensor['pitch'], yaw=sensor['yaw'], roll=sensor['roll']))
+
+
+def mount_inverse(sensor):
+    """Inverse of the sensor's mount matrix, for vehicle_transform()."""
+    return np.linalg.inv(np.array(sensor_transform(sensor).get_matrix()))
+
+
+def vehicle_transform(transform, mount_inverse):
+    """Transform of the vehicle from the world transform of a sensor mounted on it."""
+    m = np.array(transform.get_matrix()).dot(mount_inverse)
+    return carla.Transform(
+        carla.Location(x=m[0, 3], y=m[1, 3], z=m[2, 3]),
+        carla.Rotation(
+            pitch=math.degrees(math.asin(max(min(m[2, 0], 1.0), -1.0))),
+            yaw=math.degrees(math.atan2(m[1, 0], m[0, 0])),
+            roll=math.degrees(math.atan2(-m[2, 1], m[2, 2]))))
+
+
+def spawn_rig(client, world, rig, parent):
+    """Spawn every sensor of the rig on parent in one batch, returns the actors in rig order."""
+    blueprint_library = world.get_blueprint_library()
+    batch = [
+        carla.command.SpawnActor(sensor_blueprint(blueprint_library, sensor), sensor_transform(sensor), parent.id)
+        for sensor in rig]
+    responses = client.apply_batch_sync(batch, False)
+    errors = ['%s: %s' % (sensor['name'], response.error)
+              for sensor, response in zip(rig, responses) if response.error]
+    ids = [response.actor_id for response in responses if not response.error]
+    if errors:
+        client.apply_batch([carla.command.DestroyActor(actor_id) for actor_id in ids])
+        raise RuntimeError('could not spawn the rig: %s' % ', '.join(errors))
+    actors = dict((actor.id, actor) for actor in world.get_actors(ids))
+    return [actors[actor_id] for actor_id in ids]
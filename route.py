@@ -0,0 +1,87 @@
+import numpy as np
+
+import carla
+
+
+TRANSFORM_FIELDS = ('x', 'y', 'z', 'pitch', 'yaw', 'roll')
+CONTROL_FIELDS = ('throttle', 'steer', 'brake', 'hand_brake', 'reverse', 'gear')
+
+
+# ==============================================================================
+# -- RouteRecorder -------------------------------------------------------------
+# ==============================================================================
+
+
+class RouteRecorder(object):
+    """Logs the ego transform and control inputs of every tick of a drive.
+
+    The route is kept in memory, a few dozen bytes per tick, and saved as a
+    compressed .npz on save() / close(): frames (int64), transforms (N, 6)
+    float64 in TRANSFORM_FIELDS order, controls (N, 6) float32 in
+    CONTROL_FIELDS order, plus the town and the fixed time step.
+    """
+
+    def __init__(self, path, town='', delta_seconds=0.0):
+        self.path = path
+        self.town = town
+        self.delta_seconds = delta_seconds
+        self._frames = []
+        self._transforms = []
+        self._controls = []
+
+    def __len__(self):
+        return len(self._frames)
+
+    def record(self, frame, vehicle):
+        t = vehicle.get_transform()
+        c = vehicle.get_control()
+        self._frames.append(frame)
+        self._transforms.append((
+            t.location.x, t.location.y, t.location.z, t.rotation.pitch, t.rotation.yaw, t.rotation.roll))
+        self._controls.append((c.throttle, c.steer, c.brake, c.hand_brake, c.reverse, c.gear))
+
+    def save(self):
+        np.savez_compressed(
+            self.path,
+            frames=np.array(self._frames, dtype=np.int64),
+            transforms=np.array(self._transforms, dtype=np.float64).reshape(-1, len(TRANSFORM_FIELDS)),
+            controls=np.array(self._controls, dtype=np.float32).reshape(-1, len(CONTROL_FIELDS)),
+            town=np.array(self.town),
+            delta_seconds=np.array(self.delta_seconds))
+
+    def close(self):
+        if self._frames:
+            self.save()
+            print('RouteRecorder: saved %d steps to %s' % (len(self), self.path))
+
+
+# ==============================================================================
+# -- Route ---------------------------------------------------------------------
+# ==============================================================================
+
+
+class Route(object):
+    """A route saved by RouteRecorder, step by step."""
+
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.frames = data['frames']
+            self.transforms = data['transforms']
+            self.controls = data['controls']
+            self.town = str(data['town'])
+            self.delta_seconds = float(data['delta_seconds'])
+
+    def __len__(self):
+        return len(self.frames)
+
+    def transform(self, step):
+        x, y, z, pitch, yaw, roll = self.transforms[step]
+        return carla.Transform(
+            carla.Location(x=float(x), y=float(y), z=float(z)),
+            carla.Rotation(pitch=float(pitch), yaw=float(yaw), roll=float(roll)))
+
+    def control(self, step):
+        throttle, steer, brake, hand_brake, reverse, gear = self.controls[step]
+        return carla.VehicleControl(
+            throttle=float(throttle), steer=float(steer), brake=float(brake),
+            hand_brake=bool(hand_brake), reverse=bool(reverse), gear=int(gear))
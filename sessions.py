@@ -0,0 +1,302 @@
+"""
+Collection sessions.
+
+Every run of the collector writes to its own session directory,
+<output-dir>/<session>, named after the local time it started unless
+--session is given, and <output-dir>/LATEST names the last one. The
+session's journal.jsonl is an append-only manifest, one JSON record per
+line:
+
+    {"type": "session", ...}   once, when the session is created
+    {"type": "run", ...}       every start or resume: map, weather, sensors,
+                               simulator settings, first frame id of the run
+    {"type": "weather", ...}   weather changes
+    {"type": "frame", ...}     every frame once it is written, with the
+                               simulator frame and timestamp it was taken at
+    {"type": "close", ...}     clean shutdown, with the recorder stats
+
+Frame ids are local to the session: the first frame of a session is 0
+whatever the simulator's frame counter says, and --resume carries on after
+the last frame id of the session, so a restarted simulator counting its
+frames from 0 again never overwrites earlier frames. Resuming only reads
+the end of the journal, a session of millions of frames continues as fast
+as an empty one.
+"""
+
+import json
+import os
+import threading
+import time
+
+
+JOURNAL = 'journal.jsonl'
+LATEST = 'LATEST'
+
+
+# ==============================================================================
+# -- Journal -------------------------------------------------------------------
+# ==============================================================================
+
+
+class Journal(object):
+    """Append-only JSON lines file, fsynced in batches.
+
+    Every record reaches the OS as soon as it is appended, so a crash of the
+    collector loses nothing. It is only forced to disk every sync_every
+    records or sync_interval seconds, and on close: a power loss costs at
+    most that many records.
+    """
+
+    def __init__(self, path, sync_every=256, sync_interval=2.0):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._pending = 0
+        self._last_sync = time.time()
+        self._lock = threading.Lock()
+        if os.path.isfile(path):
+            drop_torn_line(path)
+        self._file = open(path, 'ab')
+
+    def append(self, record):
+        line = (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self._pending += 1
+            if self._pending >= self.sync_every or time.time() - self._last_sync > self.sync_interval:
+                self._sync()
+
+    def sync(self):
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            self._file.close()
+
+    def _sync(self):
+        if self._pending:
+            os.fsync(self._file.fileno())
+            self._pending = 0
+        self._last_sync = time.time()
+
+
+def drop_torn_line(path, block=4096):
+    """Cut a last line left half written by a crash."""
+    with open(path, 'r+b') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return
+        end = size
+        while end > 0:
+            start = max(end - block, 0)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline >= 0:
+                f.truncate(start + newline + 1)
+                return
+            end = start
+        f.truncate(0)
+
+
+def read_head(path):
+    """First record of a journal, None if it is empty."""
+    with open(path, 'rb') as f:
+        line = f.readline()
+    return json.loads(line.decode('utf-8')) if line.endswith(b'\n') else None
+
+
+def read_tail(path, max_bytes=65536):
+    """Complete records in the last max_bytes of a journal, oldest first."""
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        start = max(size - max_bytes, 0)
+        f.seek(start)
+        data = f.read()
+    lines = data.split(b'\n')
+    # The first line is partial unless we read from the start, the last
+    # one is partial (or empty) anyway.
+    lines = lines[1 if start else 0:-1]
+    return [json.loads(line.decode('utf-8')) for line in lines if line]
+
+
+def journal_state(path):
+    """(next frame id, last run) of a journal, from its tail."""
+    size = os.path.getsize(path)
+    max_bytes = 65536
+    while True:
+        records = read_tail(path, max_bytes)
+        last_frame, next_frame, run = None, None, None
+        for record in reversed(records):
+            if run is None and 'run' in record:
+                run = record['run']
+            if record['type'] == 'frame':
+                last_frame = max(last_frame, record['frame']) if last_frame is not None else record['frame']
+            elif 'next_frame' in record:
+                # Frames of a run are never numbered below its first one.
+                next_frame = record['next_frame']
+                break
+        if last_frame is not None:
+            next_frame = max(next_frame if next_frame is not None else last_frame + 1, last_frame + 1)
+        if next_frame is not None or max_bytes >= size:
+            return next_frame or 0, run
+        max_bytes *= 4
+
+
+# ==============================================================================
+# -- Session -------------------------------------------------------------------
+# ==============================================================================
+
+
+class Session(object):
+    """The directory and journal of one collection session under root.
+
+    With resume the session is taken from root/LATEST when no session_id is
+    given. next_frame is the id the next saved frame gets, run the number
+    of the last run.
+    """
+
+    def __init__(self, root, session_id=None, resume=False, sync_every=256, sync_interval=2.0):
+        self.root = root
+        self.next_frame = 0
+        self.run = 0
+        # Frames are journaled from the writer threads.
+        self._lock = threading.Lock()
+        if resume and session_id is None:
+            session_id = latest_session(root)
+            if session_id is None:
+                raise ValueError('%s: no session to resume' % root)
+        if session_id is None:
+            session_id = new_session_id(root)
+        self.id = session_id
+        self.path = os.path.join(root, session_id)
+        journal = os.path.join(self.path, JOURNAL)
+        exists = os.path.isfile(journal) and os.path.getsize(journal) > 0
+        if exists and not resume:
+            raise ValueError('session %s already exists in %s, use --resume to continue it' % (session_id, root))
+        if resume and not os.path.isdir(self.path):
+            raise ValueError('%s: no session %s to resume' % (root, session_id))
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        self.journal = Journal(journal, sync_every, sync_interval)
+        if exists:
+            self.next_frame, run = journal_state(journal)
+            self.run = run or 0
+        else:
+            self.journal.append({'type': 'session', 'session': session_id, 'created': time.time()})
+        self._set_latest()
+
+    def start_run(self, **info):
+        """Journal a run of the collector, next_frame is its first frame id."""
+        self.run += 1
+        record = {'type': 'run', 'run': self.run, 'time': time.time(), 'next_frame': self.next_frame}
+        record.update(info)
+        self.journal.append(record)
+        self.journal.sync()
+
+    def frame(self, frame, sim_frame, timestamp):
+        with self._lock:
+            self.next_frame = max(self.next_frame, frame + 1)
+        self.journal.append({'type': 'frame', 'run': self.run, 'frame': frame, 'sim': sim_frame, 't': timestamp})
+
+    def saved_frames(self):
+        """Frame ids journaled so far, reads the whole journal."""
+        frames = set()
+        with open(self.journal.path, 'rb') as f:
+            for line in f:
+                if line.endswith(b'\n') and b'"type":"frame"' in line:
+                    frames.add(json.loads(line.decode('utf-8'))['frame'])
+        return frozenset(frames)
+
+    def weather(self, sim_frame, name=None, values=None):
+        self.journal.append({'type': 'weather', 'run': self.run, 'sim': sim_frame, 'name': name, 'values': values})
+
+    def complete(self):
+        """Journal that the run did all it was asked to, see run_complete()."""
+        self.journal.append({'type': 'complete', 'run': self.run, 'time': time.time()})
+
+    def close(self, stats=None):
+        self.journal.append({
+            'type': 'close', 'run': self.run, 'time': time.time(),
+            'next_frame': self.next_frame, 'stats': stats})
+        self.journal.close()
+
+    def _set_latest(self):
+        # Coordinator workers share the root, every process its own temp file.
+        path = os.path.join(self.root, LATEST)
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(self.id + '\n')
+        os.replace(tmp, path)
+
+
+def new_session_id(root):
+    session_id = time.strftime('%Y%m%d-%H%M%S')
+    n = 1
+    while os.path.exists(os.path.join(root, session_id if n == 1 else '%s-%d' % (session_id, n))):
+        n += 1
+    return session_id if n == 1 else '%s-%d' % (session_id, n)
+
+
+def latest_session(root):
+    path = os.path.join(root, LATEST)
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return f.read().strip() or None
+
+
+def run_complete(path):
+    """Whether the last run of the session at path was journaled complete."""
+    journal = os.path.join(path, JOURNAL)
+    if not os.path.isfile(journal):
+        return False
+    records = read_tail(journal, 16384)
+    runs = [record for record in records if record['type'] in ('run', 'complete')]
+    return bool(runs) and runs[-1]['type'] == 'complete'
+
+
+def session_progress(path):
+    """(simulator ticks, simulated seconds) the runs of the session at path got through.
+
+    A run counts from its first frame to the last frame it journaled. Reads
+    the whole journal.
+    """
+    journal = os.path.join(path, JOURNAL)
+    ticks, seconds = 0, 0.0
+    if not os.path.isfile(journal):
+        return ticks, seconds
+    runs = []
+    with open(journal, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            record = json.loads(line.decode('utf-8'))
+            if record['type'] == 'run':
+                runs.append([record.get('sim_frame'), None, record.get('fixed_delta_seconds') or 0.0])
+            elif record['type'] == 'frame' and runs and runs[-1][0] is not None:
+                last = runs[-1][1]
+                runs[-1][1] = record['sim'] if last is None else max(last, record['sim'])
+    for first, last, delta in runs:
+        if last is not None:
+            ticks += last - first + 1
+            seconds += (last - first + 1) * delta
+    return ticks, seconds
+
+
+def list_sessions(root):
+    """Session directories under root (nested ones too, e.g. replay traversals), sorted."""
+    if os.path.isfile(os.path.join(root, JOURNAL)):
+        return [root]
+    sessions = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        if JOURNAL in filenames:
+            sessions.append(dirpath)
+            dirnames[:] = []
+    return sessions
@@ -0,0 +1,105 @@
+import glob
+import io
+import json
+import os
+import tarfile
+import threading
+import time
+
+
+# ==============================================================================
+# -- ShardWriter ---------------------------------------------------------------
+# ==============================================================================
+
+
+class ShardWriter(object):
+    """Writes samples into rolling WebDataset-style tar shards.
+
+    Every sample is a group of members sharing one key (``<key>.jpg``,
+    ``<key>.json`` ...). A shard is closed once it grows past max_bytes or
+    holds max_samples samples. The byte range of every member is appended
+    to index.jsonl, so readers can seek straight to a frame.
+    """
+
+    def __init__(self, shard_dir, max_bytes=512 * 1024 * 1024, max_samples=0):
+        self.shard_dir = shard_dir
+        self.max_bytes = max_bytes
+        self.max_samples = max_samples
+        if not os.path.isdir(shard_dir):
+            os.makedirs(shard_dir)
+        # Never reopen a shard from a previous run, start after the last one.
+        self._shard_index = len(glob.glob(os.path.join(shard_dir, 'shard-*.tar')))
+        self._tar = None
+        self._shard_name = None
+        self._samples = 0
+        self._lock = threading.Lock()
+        self._index = open(os.path.join(shard_dir, 'index.jsonl'), 'a')
+
+    def write(self, key, members):
+        """Add one sample, members maps extension to bytes."""
+        with self._lock:
+            if self._tar is None:
+                self._open_shard()
+            entry = {'key': key, 'shard': self._shard_name}
+            for ext, data in members.items():
+                info = tarfile.TarInfo('%s.%s' % (key, ext))
+                info.size = len(data)
+                info.mtime = int(time.time())
+                offset = self._tar.offset + len(
+                    info.tobuf(self._tar.format, self._tar.encoding, self._tar.errors))
+                self._tar.addfile(info, io.BytesIO(data))
+                entry[ext] = [offset, len(data)]
+            self._index.write(json.dumps(entry) + '\n')
+            self._samples += 1
+            if self._tar.offset >= self.max_bytes or \
+                    (self.max_samples and self._samples >= self.max_samples):
+                self._close_shard()
+
+    def close(self):
+        with self._lock:
+            self._close_shard()
+            self._index.close()
+
+    def _open_shard(self):
+        self._shard_name = 'shard-%06d.tar' % self._shard_index
+        self._shard_index += 1
+        self._samples = 0
+        self._tar = tarfile.open(
+            os.path.join(self.shard_dir, self._shard_name), 'w', format=tarfile.USTAR_FORMAT)
+
+    def _close_shard(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+        self._index.flush()
+
+
+# ==============================================================================
+# -- ShardReader ---------------------------------------------------------------
+# ==============================================================================
+
+
+class ShardReader(object):
+    """Random access to samples of a shard directory through index.jsonl."""
+
+    def __init__(self, shard_dir):
+        self.shard_dir = shard_dir
+        self.index = {}
+        with open(os.path.join(shard_dir, 'index.jsonl')) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.index[entry['key']] = entry
+
+    def keys(self):
+        return list(self.index)
+
+    def read(self, key, ext):
+        entry = self.index[key]
+        offset, size = entry[ext]
+        with open(os.path.join(self.shard_dir, entry['shard']), 'rb') as f:
+            f.seek(offset)
+            return f.read(size)
+
+    def read_meta(self, key):
+        return json.loads(self.read(key, 'json').decode('utf-8'))
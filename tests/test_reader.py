@@ -0,0 +1,50 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reader import SessionReader
+
+
+class BaselineLayoutTest(unittest.TestCase):
+    """data/ as the original collector wrote it: cam*/f<frame>.jpg and data.csv."""
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.frames = [12, 13, 15]
+        os.makedirs(os.path.join(self.data_dir, 'cam1'))
+        # Header written with the index, rows appended without it.
+        pd.DataFrame(None, columns=["Frame", "x", "y", "yaw"]).to_csv(os.path.join(self.data_dir, 'data.csv'))
+        for frame in self.frames:
+            frame_name = "f{:08d}".format(frame)
+            cv2.imwrite(os.path.join(self.data_dir, 'cam1', frame_name + '.jpg'), np.zeros((48, 64, 3), np.uint8))
+            pd.DataFrame({
+                'Frame': [frame_name],
+                'x': [str(1.5 * frame)],
+                'y': [str(-2.0 * frame)],
+                'yaw': [str(90.0)]}).to_csv(
+                    os.path.join(self.data_dir, 'data.csv'), mode='a', index=False, header=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def test_reads_images_and_poses(self):
+        reader = SessionReader(self.data_dir, batch_size=8, workers=1)
+        self.assertEqual(reader.format, 'files')
+        images, poses, frames, cameras = next(iter(reader))
+        self.assertEqual(images.shape, (3, 48, 64, 3))
+        self.assertEqual(list(frames), self.frames)
+        self.assertEqual(list(cameras), ['cam1'] * 3)
+        np.testing.assert_allclose(poses, [[1.5 * f, -2.0 * f, 90.0] for f in self.frames])
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,124 @@
+import collections
+import threading
+import traceback
+
+
+# ==============================================================================
+# -- AsyncWriter ---------------------------------------------------------------
+# ==============================================================================
+
+
+class AsyncWriter(object):
+    """Bounded queue of write jobs drained by a pool of writer threads.
+
+    Sensor callbacks hand their work over with submit() and return straight
+    away. When the queue is full the backpressure policy decides what
+    happens: 'block' waits for a free slot, 'drop-oldest' evicts the oldest
+    queued job and 'drop-newest' rejects the incoming one.
+    """
+
+    POLICIES = ('block', 'drop-oldest', 'drop-newest')
+
+    def __init__(self, num_threads=2, max_queue=64, policy='block'):
+        if policy not in self.POLICIES:
+            raise ValueError('unknown backpressure policy %r' % policy)
+        self.max_queue = max(1, max_queue)
+        self.policy = policy
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.max_depth = 0
+        self._queue = collections.deque()
+        self._active = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._threads = []
+        for n in range(max(1, num_threads)):
+            thread = threading.Thread(target=self._run, name='writer-%d' % n)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    @property
+    def queue_depth(self):
+        return len(self._queue)
+
+    def submit(self, fn, *args):
+        """Queue fn(*args) for a writer thread, returns False if dropped."""
+        with self._lock:
+            if self._closed:
+                self.dropped += 1
+                return False
+            if len(self._queue) >= self.max_queue:
+                if self.policy == 'drop-newest':
+                    self.dropped += 1
+                    return False
+                elif self.policy == 'drop-oldest':
+                    self._queue.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self._queue) >= self.max_queue and not self._closed:
+                        self._not_full.wait()
+                    if self._closed:
+                        self.dropped += 1
+                        return False
+            self._queue.append((fn, args))
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, len(self._queue))
+            self._not_empty.notify()
+        return True
+
+    def flush(self, timeout=None):
+        """Wait until every accepted job has been written."""
+        with self._lock:
+            return self._idle.wait_for(
+                lambda: not self._queue and self._active == 0, timeout)
+
+    def close(self, timeout=None):
+        """Stop accepting jobs, drain the queue and join the writer threads."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue_depth,
+            'max_depth': self.max_depth,
+            'submitted': self.submitted,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed}
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._queue and not self._closed:
+                    self._not_empty.wait()
+                if not self._queue:
+                    return
+                fn, args = self._queue.popleft()
+                self._active += 1
+                self._not_full.notify()
+            try:
+                fn(*args)
+                ok = True
+            except Exception:
+                traceback.print_exc()
+                ok = False
+            with self._lock:
+                self._active -= 1
+                if ok:
+                    self.written += 1
+                else:
+                    self.failed += 1
+                if not self._queue and self._active == 0:
+                    self._idle.notify_all()